@@ -6,6 +6,9 @@ except ImportError:
     #print("Installation complete; please rerun this cell in order for the rest of the cells to use HyperNetX.")
     exit()
 
+import numpy as np
+import scipy.sparse as sp
+
 ############################# HELP FUNCTIONS ###################################
 
 def compute_max_originality_values(H):
@@ -132,3 +135,151 @@ def strict_hyperhub_feature(H):
             if is_e1_max:
                 r.add(e1)
     return r
+
+########################### SPARSE OVERLAP FEATURES ############################
+# The following features take a SubHypergraphOverlap instead of a hypernetx
+# hypergraph, and return the array of the ids of the featured objects. They
+# give the same results as the corresponding features above, but only use
+# sparse matrix operations.
+
+class SubHypergraphOverlap:
+    """Sparse overlap structure of a sub-hypergraph whose edges and nodes are
+    integer ids. The objects are the edges of the sub-hypergraph (or its nodes
+    for a dual sub-hypergraph) and the members are their nodes.
+
+    Attributes
+    ----------
+
+    incidence : scipy.sparse.csr_matrix
+        binary matrix of shape (number of objects, number of members),
+        incidence[e, n] = 1 iff the member n is in the object e. An object is
+        in the sub-hypergraph iff its row is not empty.
+    overlap : scipy.sparse.csr_matrix
+        matrix of the intersection sizes, overlap[e, f] being the number of
+        members shared by e and f.
+        If not given, it is computed as incidence @ incidence.T.
+    sizes : numpy array
+        sizes of the objects (0 for objects that are not in the sub-hypergraph).
+    degrees : numpy array
+        number of objects containing each member.
+    """
+    def __init__(self, incidence, overlap = None):
+        self.incidence = sp.csr_matrix(incidence)
+        self.overlap = sp.csr_matrix(self.incidence @ self.incidence.T if overlap is None else overlap)
+        self.sizes = np.asarray(self.incidence.sum(axis=1)).ravel()
+        self.degrees = np.asarray(self.incidence.sum(axis=0)).ravel()
+        self.adjacencies = {}
+
+    def get_s_adjacencies(self, s_values):
+        """Computes the s-adjacency matrices of the objects for all the values
+        of s in s_values, i.e. the overlap matrix without its diagonal and
+        restricted to the pairs of objects sharing at least s members.
+        The diagonal is removed once and each value of s only thresholds the
+        data of the resulting matrix. Results are cached in self.adjacencies,
+        a dictionary of the form s : scipy.sparse.csr_matrix.
+        """
+        s_values = [s for s in s_values if s not in self.adjacencies]
+        if len(s_values) == 0:
+            return
+        off_diagonal = sp.csr_matrix(self.overlap - sp.diags(self.overlap.diagonal()))
+        off_diagonal.eliminate_zeros()
+        for s in s_values:
+            if s < 1:
+                raise ValueError("s must be at least 1")
+            adjacency = off_diagonal.copy()
+            adjacency.data[adjacency.data < s] = 0
+            adjacency.eliminate_zeros()
+            self.adjacencies[s] = adjacency
+
+    def get_adjacency(self, s = 1):
+        """Returns the s-adjacency matrix of the objects, i.e. the matrix of the
+        intersection sizes of the pairs of distinct objects sharing at least s
+        members (see `get_s_adjacencies`).
+        """
+        self.get_s_adjacencies([s])
+        return self.adjacencies[s]
+
+def get_rows_max(matrix, values):
+    """Returns the maximum of values (aligned with matrix.data) on each row of
+    the csr matrix matrix, or 0 for empty rows.
+    """
+    r = np.zeros(matrix.shape[0], dtype=np.asarray(values).dtype)
+    nonempty = np.diff(matrix.indptr) > 0
+    if nonempty.any():
+        r[nonempty] = np.maximum.reduceat(values, matrix.indptr[:-1][nonempty])
+    return r
+
+def compute_overlap_max_originality_values(overlap):
+    """Same as compute_max_originality_values, returns a dictionary
+    object id : max-originality.
+    """
+    adjacency = overlap.get_adjacency()
+    objects = np.flatnonzero(overlap.sizes > 0)
+    values = 1.0 - get_rows_max(adjacency, adjacency.data)[objects] / overlap.sizes[objects]
+    return dict(zip(objects.tolist(), values.tolist()))
+
+def compute_overlap_mean_originality_values(overlap):
+    """Same as compute_mean_originality_values, returns a dictionary
+    object id : mean-originality.
+    """
+    adjacency = overlap.get_adjacency()
+    objects = np.flatnonzero(overlap.sizes > 0)
+    neighbors = np.diff(adjacency.indptr)[objects]
+    sums = np.asarray(adjacency.sum(axis=1)).ravel()[objects]
+    values = np.ones(len(objects))
+    has_neighbors = neighbors > 0
+    values[has_neighbors] = 1.0 - sums[has_neighbors] / (neighbors * overlap.sizes[objects])[has_neighbors]
+    return dict(zip(objects.tolist(), values.tolist()))
+
+def overlap_max_originality_feature(overlap, t = 0.5):
+    """
+    Same as max_originality_feature on a SubHypergraphOverlap.
+    """
+    originalities = compute_overlap_max_originality_values(overlap)
+    return np.asarray([e for e, o in originalities.items() if o > t], dtype=np.int64)
+
+def overlap_mean_originality_feature(overlap, t = 0.75):
+    """
+    Same as mean_originality_feature on a SubHypergraphOverlap.
+    """
+    originalities = compute_overlap_mean_originality_values(overlap)
+    return np.asarray([e for e, o in originalities.items() if o > t], dtype=np.int64)
+
+def overlap_local_max_size_feature(overlap, s = 1):
+    """
+    Same as local_max_size_feature on a SubHypergraphOverlap: the objects
+    with at least one s-neighbor and no s-neighbor bigger than them, where
+    s-neighbors are objects sharing at least s members.
+    """
+    adjacency = overlap.get_adjacency(s)
+    neighbor_max = get_rows_max(adjacency, overlap.sizes[adjacency.indices])
+    return np.flatnonzero((np.diff(adjacency.indptr) > 0) & (overlap.sizes >= neighbor_max))
+
+def overlap_exclusivity_feature(overlap, s = 1):
+    """
+    Same as exclusivity_feature on a SubHypergraphOverlap: the objects that
+    contain a member contained in none of their s-neighbors, where
+    s-neighbors are objects sharing at least s members. For s = 1, these are
+    the objects containing a member contained in no other object.
+    """
+    if s == 1:
+        exclusive_members = (overlap.degrees == 1).astype(np.int64)
+        return np.flatnonzero(overlap.incidence @ exclusive_members > 0)
+    adjacency = overlap.get_adjacency(s)
+    adjacency = sp.csr_matrix((np.ones(len(adjacency.data), dtype=np.int64),
+        adjacency.indices, adjacency.indptr), shape=adjacency.shape)
+    # number of members of each object that are contained in an s-neighbor:
+    covered = np.asarray((adjacency @ overlap.incidence).multiply(overlap.incidence)
+        .astype(bool).sum(axis=1)).ravel()
+    return np.flatnonzero((overlap.sizes > 0) & (covered < overlap.sizes))
+
+def overlap_strict_hyperhub_feature(overlap, s = 1):
+    """
+    Same as strict_hyperhub_feature on a SubHypergraphOverlap: the objects
+    that have strictly more s-neighbors than their s-neighbors, where
+    s-neighbors are objects sharing at least s members.
+    """
+    adjacency = overlap.get_adjacency(s)
+    lens = np.diff(adjacency.indptr)
+    neighbor_max = get_rows_max(adjacency, lens[adjacency.indices])
+    return np.flatnonzero((lens > 0) & (lens > neighbor_max))
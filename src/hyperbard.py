@@ -0,0 +1,64 @@
+# Hyperbard loaders
+# Build the hypergraph filtrations of the files of the Hyperbard dataset
+# (see `data/`), for `test_hyperbard.py` and the persistence service.
+from src.hypergraph_filtration import HyperGraphFiltration
+
+try:
+    import hypernetx as hnx
+except ImportError:
+    print("HyperNetX not found")
+    print("Installation complete; please try to install HyperNetX (for instance with a command like `pip install hypernetx`).")
+    exit()
+
+# suffixes erased from the character names of the hyperbard files
+HYPERBARD_STRINGS_TO_ERASE = ["_Lr", "_Rom", "_Ham"]
+
+################################################################################
+
+# Take an edges.csv file and return a list of dictionary, each dictionary represent a hyperedge.
+# Note that this function was designed to work with the hyperbard dataset.
+# strings_to_erase is a list of strings that should be replaced by "" when reading the file
+def build_edgedict_from_hyperbard_file(file, strings_to_erase = []):
+    # process first line
+    keys = file.readline()[:-1].split(',')
+    keys_n = len(keys)
+
+    # process other lines
+    r = []
+    while (l := file.readline()):
+        l = l[:-1]
+        for s in strings_to_erase:
+            l = l.replace(s, "")
+        dict = {}
+        objects = l.split(',')
+        if keys_n == len(objects):
+            for i, s in enumerate(objects):
+                if s.isnumeric():
+                    dict[keys[i]] = int(s)
+                elif ' ' in s or '#' in s:
+                    dict[keys[i]] = s.replace("#", "").split(' ')
+                else:
+                    dict[keys[i]] = s
+            r.append(dict)
+        else:
+            print("Error, keys and objects doesn't have the same cardinal")
+    return r
+
+# Build a HyperGraphFiltration object from a list of dictionary (each representing a hyperedge).
+# nodes_key is the dictionary key that must be associated with a set of nodes
+# name_key is the dictionary key that must be associated with the name of the hyperedge
+# weight_key is the dictionary key that must be associated with the weight of the hyperedge
+def build_hypergraphfiltration_from_edgedict(edgedict, nodes_key, name_key = None, weight_key = None, max_edges = 100000):
+    hypergraphdict = {}
+    edge_weights = {}
+    node_weights = {}
+
+    for edge_number, dict in enumerate(edgedict):
+        nodes = set(dict[nodes_key])
+        name = edge_number if name_key is None else dict[name_key]
+        weight = edge_number if weight_key is None else dict[weight_key]
+        hypergraphdict[name] = nodes
+        edge_weights[name] = weight
+        if edge_number >= max_edges:
+            break
+    return HyperGraphFiltration(hnx.Hypergraph(hypergraphdict, sort=False), node_weights, edge_weights, [0.0])
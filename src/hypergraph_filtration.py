@@ -17,33 +17,227 @@ except ImportError:
     TQDM_FOUND = False
 
 import matplotlib.pyplot as plt
+import numpy as np
+import scipy.sparse as sp
 from numpy import inf as INFINITY
 from numpy import linspace as linspace
+from bisect import bisect_left
+import heapq
+import threading
+from collections import namedtuple
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
 
 from src.persistence import CornerPoint
 from src.persistence import PersistenceDiagram
+from src.edge_features import SubHypergraphOverlap
+from src.sharded_persistence import SteadyShard
+from src.sharded_persistence import merge_steady_shards
+from src.sharded_persistence import merge_ranging_shards
 
 import warnings
 warnings.simplefilter('ignore')
 
+def intern_objects(objects, labels, ids):
+    """Returns the list of the integer ids of objects. labels is the list of
+    the already interned objects (labels[id] is the object of id id) and ids
+    is the inverse dictionary object : id. Unknown objects are given the next
+    available ids and added to labels and ids.
+    """
+    r = []
+    for object in objects:
+        if object not in ids:
+            ids[object] = len(labels)
+            labels.append(object)
+        r.append(ids[object])
+    return r
+
+def get_feature_array(feature_set):
+    """Returns the sorted int32 array of the object ids of feature_set.
+    """
+    return np.sort(np.fromiter(feature_set, dtype=np.int32, count=len(feature_set)))
+
+def sweep_steady_steps(feature_sets, time_range, alive, births):
+    """Generates, for every time t of time_range and its feature set, the
+    triple (t, dead, dead_births) of the objects alive before t that are not
+    featured at t and of their births. alive and births (boolean array of the
+    alive objects over the object ids and array of their births) are updated
+    in place: objects featured at t and not alive before are born at t.
+    This is the step shared by all the steady sweeps.
+    """
+    new_alive = np.empty(len(alive), dtype=bool)
+    for t, feature_set in zip(time_range, feature_sets):
+        new_alive[:] = False
+        new_alive[feature_set] = True
+        dead = np.flatnonzero(alive & ~new_alive)
+        dead_births = births[dead]
+        births[new_alive & ~alive] = t
+        alive[:] = new_alive
+        yield t, dead, dead_births
+
+def merge_ranging_intervals(ranging_births, ranging_deaths, objects, births, deaths):
+    """Merges the steady intervals (objects, births, deaths) into the
+    ranging intervals of their objects, i.e. into the arrays over the object
+    ids of the minimal births and maximal deaths.
+    """
+    np.minimum.at(ranging_births, objects, births)
+    np.maximum.at(ranging_deaths, objects, deaths)
+
+def sweep_steady_intervals(feature_sets, time_range, alive, births, start = 0):
+    """Sweeps the feature sets from the time index start and returns the
+    steady intervals as three arrays (objects, births, deaths), objects still
+    alive at the last time step having an infinite death.
+    alive and births are the boolean array over the object ids of the objects
+    alive at the time index start-1 and the array of their births; they are
+    modified by the sweep. feature_sets is either a sequence aligned with
+    time_range or an iterator over the feature sets from start, so that
+    feature sets can be computed during the sweep.
+    """
+    if not isinstance(feature_sets, Iterator):
+        feature_sets = iter(feature_sets[start:])
+    dead_objects = []
+    dead_births = []
+    dead_times = []
+    for t, dead, births_of_dead in sweep_steady_steps(feature_sets, time_range[start:], alive, births):
+        dead_objects.append(dead)
+        dead_births.append(births_of_dead)
+        dead_times.append(np.full(len(dead), t, dtype=float))
+    dead = np.flatnonzero(alive)
+    dead_objects.append(dead)
+    dead_births.append(births[dead])
+    dead_times.append(np.full(len(dead), INFINITY))
+    return (np.concatenate(dead_objects), np.concatenate(dead_births),
+        np.concatenate(dead_times))
+
+def get_ranging_cornerpoints(steady_cornerpoints):
+    """Returns the list of ranging cornerpoints obtained by merging, for
+    each object, the steady cornerpoints of steady_cornerpoints.
+    """
+    if len(steady_cornerpoints) == 0:
+        return []
+    objects = np.fromiter((cp.object for cp in steady_cornerpoints), dtype=np.int64,
+        count=len(steady_cornerpoints))
+    ranging_births = np.full(objects.max() + 1, INFINITY)
+    ranging_deaths = np.full(objects.max() + 1, -INFINITY)
+    merge_ranging_intervals(ranging_births, ranging_deaths, objects,
+        [cp.birth for cp in steady_cornerpoints], [cp.death for cp in steady_cornerpoints])
+    _, first_indices = np.unique(objects, return_index=True)
+    objects = objects[np.sort(first_indices)]
+    return [CornerPoint(0, b, d, object = object)
+        for object, b, d in zip(objects.tolist(), ranging_births[objects].tolist(),
+            ranging_deaths[objects].tolist())]
+
+SHARDED_FILTRATION = None # filtration of a worker process of a process pool of a filtration
+
+def set_sharded_filtration(filtration):
+    """Initializer of the worker processes of
+    `HyperGraphFiltration.get_sharded_feature_persistence` and
+    `BatchHyperGraphFiltration.get_batch_feature_persistence`: the filtration
+    is sent once per worker instead of once per task.
+    """
+    global SHARDED_FILTRATION
+    SHARDED_FILTRATION = filtration
+
+def get_sharded_steady_shard(feature, start, stop, dual):
+    """Returns the SteadyShard of the filtration of the worker process.
+    """
+    return SHARDED_FILTRATION.get_steady_shard(feature, start, stop, dual = dual)
+
+def get_sharded_weighting_feature_persistence(feature, k, dual):
+    """Returns the FeaturePersistence of the k-th weighting of the
+    BatchHyperGraphFiltration of the worker process.
+    """
+    return SHARDED_FILTRATION.get_weighting_feature_persistence(feature, k, dual = dual)
+
+class FeaturePersistence(namedtuple("FeaturePersistence", ["feature", "dual",
+        "time_range", "feature_sets", "steady_cornerpoints", "steady_pd",
+        "ranging_cornerpoints", "ranging_pd"])):
+    """Immutable result of the persistence computation of a feature on a
+    HyperGraphFiltration.
+
+    Attributes
+    ----------
+
+    feature : function
+        the feature, taking a sub-hypergraph and returning a set of objects.
+    dual : bool
+        True if the feature was computed on the dual sub-hypergraphs.
+    time_range : tuple
+        time range of the filtration at the time of the computation.
+    feature_sets : tuple
+        feature_sets[i] is the read-only array of the object ids featured at
+        time_range[i].
+    steady_cornerpoints, ranging_cornerpoints : tuple
+        tuples of CornerPoint.
+    steady_pd, ranging_pd : PersistenceDiagram
+        steady and ranging persistence diagrams.
+    """
+    __slots__ = ()
+
+class TopKFeaturePersistence(namedtuple("TopKFeaturePersistence", ["feature", "dual",
+        "time_range", "k", "steady_cornerlines", "steady_cornerpoints",
+        "ranging_cornerlines", "ranging_cornerpoints", "labels"])):
+    """Immutable result of the top-k persistence computation of a feature
+    (see `HyperGraphFiltration.get_top_k_feature_persistence`).
+    steady_cornerpoints and ranging_cornerpoints are the k most persistent
+    proper cornerpoints, equal to the result of
+    `PersistenceDiagram.get_n_most_persistent_cornerpoints(k)` on the full
+    diagrams, and steady_cornerlines and ranging_cornerlines are all the
+    cornerlines of the diagrams. labels is the table of the labels of the
+    objects of the cornerpoints (edge labels, or node labels if dual).
+    """
+    __slots__ = ()
+
 class HyperGraphFiltration:
     """
+    Edges and nodes are interned when the filtration is built: self.H is a
+    copy of the given hypergraph whose edges and nodes are replaced by
+    contiguous integer ids, and the feature sets and the persistence diagrams
+    are computed on these ids. The original edges and nodes are only decoded
+    for outputs and plots.
+
     Attributes
     ----------
 
-    edge_weights : dictionary
-        dictionary of weights of edges. No weight for an edge is considered as
-        -inf.
-    node_weights : dictionary
-        dictionary of weights of nodes. No weight for an node is considered as
-        -inf.
+    edge_labels : list
+        list of the original edges, edge_labels[i] being the edge of id i.
+    node_labels : list
+        list of the original nodes, node_labels[i] being the node of id i.
+    edge_ids : dictionary
+        dictionary of the form original edge : id.
+    node_ids : dictionary
+        dictionary of the form original node : id.
+    edge_weights : numpy array
+        array of weights of edges indexed by edge ids. No weight for an edge
+        is encoded as nan, and such an edge is never in a sub-hypergraph.
+    node_weights : numpy array
+        array of weights of nodes indexed by node ids. No weight for a node
+        is encoded as nan, and such a node is considered as having weight -inf.
+    incidence : scipy.sparse.csr_matrix
+        binary incidence matrix of shape (number of edges, number of nodes).
+    edge_overlap : scipy.sparse.csr_matrix or None
+        matrix of the intersection sizes of the edges, None until an overlap
+        feature needs it (see `get_edge_overlap`).
+    overlap_lock : threading.Lock
+        lock under which self.edge_overlap is computed, once.
     """
     def __init__(self, hnx_hypergraph = None, node_weights = {}, edge_weights = {}, time_range = [0.0]):
         print("init HyperGraphFiltration")
         if hnx_hypergraph is not None:
-            self.H = hnx_hypergraph
-            self.edge_weights = edge_weights
-            self.node_weights = node_weights
+            self.edge_labels = []
+            self.edge_ids = {}
+            self.node_labels = []
+            self.node_ids = {}
+            intern_objects(hnx_hypergraph.nodes, self.node_labels, self.node_ids)
+            self.H = hnx.Hypergraph({
+                self.intern_edges([edge])[0] : self.intern_nodes(nodes)
+                for edge, nodes in hnx_hypergraph.incidence_dict.items()}, sort=False)
+            self.edge_weights = np.full(0, np.nan)
+            self.node_weights = np.full(0, np.nan)
+            self.set_weights(edge_weights, node_weights)
+            self.overlap_lock = threading.Lock()
+            self.compute_incidence_matrices()
             if time_range == []:
                 self.time_range = [0.0]
             else:
@@ -51,13 +245,52 @@ class HyperGraphFiltration:
         else:
             raise ValueError("Specify hypergraph as a hypernetworkx hypergraph")
 
+    def intern_edges(self, edges):
+        """Returns the ids of edges, new edges being given new ids.
+        """
+        return intern_objects(edges, self.edge_labels, self.edge_ids)
+
+    def intern_nodes(self, nodes):
+        """Returns the ids of nodes, new nodes being given new ids.
+        """
+        return intern_objects(nodes, self.node_labels, self.node_ids)
+
+    def set_weights(self, edge_weights = {}, node_weights = {}):
+        """Sets the weights of edges and nodes given as dictionaries of the form
+        original edge (or node) : weight.
+        """
+        edge_ids = self.intern_edges(edge_weights.keys())
+        node_ids = self.intern_nodes(node_weights.keys())
+        self.edge_weights = np.concatenate((self.edge_weights,
+            np.full(len(self.edge_labels) - len(self.edge_weights), np.nan)))
+        self.node_weights = np.concatenate((self.node_weights,
+            np.full(len(self.node_labels) - len(self.node_weights), np.nan)))
+        self.edge_weights[edge_ids] = list(edge_weights.values())
+        self.node_weights[node_ids] = list(node_weights.values())
+
+    def get_object_labels(self, dual=False):
+        """Returns the labels of the objects of the sub-hypergraphs features,
+        i.e. self.edge_labels, or self.node_labels if dual.
+        """
+        return self.node_labels if dual else self.edge_labels
+
+    def get_labeled_hypergraph(self, hypergraph, dual=False):
+        """Returns a copy of hypergraph (a sub-hypergraph of self.H, or of its
+        dual if dual) with the original edges and nodes instead of their ids.
+        """
+        edge_labels = self.get_object_labels(dual)
+        node_labels = self.get_object_labels(not dual)
+        return hnx.Hypergraph({edge_labels[edge] : [node_labels[node] for node in nodes]
+            for edge, nodes in hypergraph.incidence_dict.items()}, sort=False)
+
     # def get_filtration_values(self, sub_hypergraph, func):
     #     """Evaluates func on the weights defined on the edges
     #     """
     #     return func(np.asarray(list(nx.get_edge_attributes(sub_hypergraph,
     #                                                        'weight').values())))
     def compute_time_range_from_weights(self, nb_sample = None):
-        self.time_range = sorted(set(list(self.edge_weights.values()) + list(self.node_weights.values())))
+        weights = np.concatenate((self.edge_weights, self.node_weights))
+        self.time_range = sorted(set(weights[~np.isnan(weights)].tolist()))
         if nb_sample != None and nb_sample > 0 and nb_sample < len(self.time_range):
             self.time_range = [self.time_range[int(round(i))] for i in linspace(0, len(self.time_range)-1, nb_sample)]
 
@@ -65,29 +298,25 @@ class HyperGraphFiltration:
         """Returns the edges of self.H part of the sublevel set defined by time
         Warning: it also returns the edges that do not have weights.
         """
-        return [edge for edge in self.H.edges
-            if (not edge in self.edge_weights or self.edge_weights[edge] <= time)]
+        return np.flatnonzero(~(self.edge_weights > time)).tolist()
 
     def get_sup_hypergraph_edges(self, time):
         """Returns the edges of self.H part of the suplevel set defined by time
         Warning: it also returns the edges that do not have weights.
         """
-        return [edge for edge in self.H.edges
-            if (not edge in self.edge_weights or self.edge_weights[edge] > time)]
+        return np.flatnonzero(~(self.edge_weights <= time)).tolist()
 
     def get_sub_hypergraph_nodes(self, time):
         """Returns the nodes of self.H part of the sublevel set defined by time.
         Warning: it also returns the nodes that do not have weights.
         """
-        return [node for node in self.H.nodes
-            if (not node in self.node_weights or self.node_weights[node] <= time)]
+        return np.flatnonzero(~(self.node_weights > time)).tolist()
 
     def get_sup_hypergraph_nodes(self, time):
         """Returns the nodes of self.H part of the suplevel set defined by time.
         Warning: it also returns the nodes that do not have weights.
         """
-        return [node for node in self.H.nodes
-            if (not node in self.node_weights or self.node_weights[node] > time)]
+        return np.flatnonzero(~(self.node_weights <= time)).tolist()
 
     def get_sub_hypergraph(self, time, dual=False):
         """Returns the sub_hypergraph at time. If dual, returns the dual graph.
@@ -99,73 +328,517 @@ class HyperGraphFiltration:
             return self.H.restrict_to_nodes(self.get_sub_hypergraph_nodes(time)) \
                 .remove_edges(self.get_sup_hypergraph_edges(time))
 
-    def compute_feature_steady_persistence(self, feature, above_max_diagonal_gap=False,
-            gap_number=0, display_progress=False, dual=False):
-        """Compute steady persistence of a feature. Recall that an object
-        is steady if it lives through consecutive sublevel sets of
-        the filtration induced by the weights of the hupergraph.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["overlap_lock"] # a lock cannot be pickled
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.overlap_lock = threading.Lock()
+
+    def compute_incidence_matrices(self):
+        """Computes the sparse binary incidence matrix self.incidence, of shape
+        (number of edges, number of nodes). The edge-overlap matrix is only
+        computed when needed (see `get_edge_overlap`).
+        """
+        edges, nodes = zip(*[(edge, node) for edge, edge_nodes in self.H.incidence_dict.items()
+            for node in edge_nodes]) if len(self.H.incidence_dict) > 0 else ((), ())
+        incidence = sp.csr_matrix((np.ones(len(edges), dtype=np.int64), (edges, nodes)),
+            shape=(len(self.edge_labels), len(self.node_labels)))
+        incidence.data[:] = 1 # repeated incidences are counted once
+        with self.overlap_lock:
+            self.incidence, self.edge_overlap = incidence, None
+
+    def get_edge_overlap(self):
+        """Returns the edge-overlap matrix self.edge_overlap of the intersection
+        sizes of the edges of self.H, computed at the first call (only the
+        overlap features need it). Concurrent first calls compute it once.
+        """
+        edge_overlap = self.edge_overlap
+        if edge_overlap is None:
+            with self.overlap_lock:
+                if self.edge_overlap is None:
+                    self.edge_overlap = sp.csr_matrix(self.incidence @ self.incidence.T)
+                edge_overlap = self.edge_overlap
+        return edge_overlap
+
+    def append_incidence_matrices(self, incidences):
+        """Appends to self.incidence the rows of the edges interned since it
+        was computed, given their incidences as pairs (edge id, node id). If
+        self.edge_overlap was computed, only the block of the new edges is
+        appended to it.
+        """
+        nb_old_edges = self.incidence.shape[0]
+        nb_nodes = len(self.node_labels)
+        edges, nodes = zip(*incidences) if len(incidences) > 0 else ((), ())
+        new_incidence = sp.csr_matrix((np.ones(len(edges), dtype=np.int64),
+            (np.asarray(edges, dtype=np.int64) - nb_old_edges, np.asarray(nodes, dtype=np.int64))),
+            shape=(len(self.edge_labels) - nb_old_edges, nb_nodes))
+        new_incidence.data[:] = 1
+        old_incidence = sp.csr_matrix((self.incidence.data, self.incidence.indices,
+            self.incidence.indptr), shape=(nb_old_edges, nb_nodes)) # new nodes as empty columns
+        incidence = sp.vstack([old_incidence, new_incidence], format="csr")
+        with self.overlap_lock:
+            edge_overlap = self.edge_overlap
+            if edge_overlap is not None:
+                cross = sp.csr_matrix(new_incidence @ incidence.T)
+                edge_overlap = sp.vstack([sp.hstack([edge_overlap, cross[:, :nb_old_edges].T]), cross],
+                    format="csr")
+            self.incidence, self.edge_overlap = incidence, edge_overlap
+
+    def get_masked_overlap(self, alive_edges, alive_nodes = None, dual=False):
+        """Returns the SubHypergraphOverlap of the sub-hypergraph made of the
+        edges of the boolean array alive_edges restricted to the nodes of the
+        boolean array alive_nodes (all nodes if None), or of its dual if dual.
+        The edge-overlap matrix is only recomputed if some nodes are not alive.
+        """
+        edge_mask = sp.diags(alive_edges.astype(np.int64))
+        incidence = edge_mask @ self.incidence
+        if alive_nodes is not None:
+            incidence = incidence @ sp.diags(alive_nodes.astype(np.int64))
+        if dual:
+            return SubHypergraphOverlap(sp.csr_matrix(incidence.T))
+        if alive_nodes is None:
+            return SubHypergraphOverlap(sp.csr_matrix(incidence),
+                sp.csr_matrix(edge_mask @ self.get_edge_overlap() @ edge_mask))
+        return SubHypergraphOverlap(sp.csr_matrix(incidence))
+
+    def get_sub_overlap(self, time, dual=False):
+        """Returns the SubHypergraphOverlap of the sub-hypergraph at time (or of
+        its dual if dual), i.e. the sparse counterpart of
+        `self.get_sub_hypergraph(time, dual)`.
+        """
+        alive_nodes = ~(self.node_weights > time)
+        return self.get_masked_overlap(self.edge_weights <= time,
+            None if alive_nodes.all() else alive_nodes, dual = dual)
+
+    def get_steady_cornerpoints(self, feature_sets, start = 0, steady_cornerpoints = None, dual = False,
+            time_range = None):
+        """Returns the list of steady cornerpoints of a sequence of feature
+        sets, feature_sets[i] being the array of object ids (see
+        `get_feature_array`) featured at time self.time_range[i].
+        The sweep keeps the alive objects in a boolean array over the object
+        ids (edge ids, or node ids if dual), so births and deaths at each time
+        step are computed by vectorized comparisons of boolean arrays.
+        If start > 0, steady_cornerpoints must be the cornerpoints previously
+        computed on a time range whose first start values are the ones of
+        self.time_range: the cornerpoints closed before self.time_range[start]
+        are kept, the ones alive at self.time_range[start-1] are reopened and
+        the sweep only goes through the time steps from start.
+        time_range replaces self.time_range if it is not None.
+        """
+        time_range = self.time_range if time_range is None else time_range
+        n = len(self.get_object_labels(dual))
+        alive = np.zeros(n, dtype=bool)
+        births = np.full(n, np.nan)
+        if start > 0 and steady_cornerpoints is not None:
+            last_time = time_range[start-1]
+            kept_cornerpoints = []
+            for cp in steady_cornerpoints:
+                if cp.death <= last_time:
+                    kept_cornerpoints.append(cp)
+                elif cp.birth <= last_time:
+                    alive[cp.object] = True
+                    births[cp.object] = cp.birth
+            steady_cornerpoints = kept_cornerpoints
+        else:
+            start = 0
+            steady_cornerpoints = []
+
+        objects, births, deaths = self.get_steady_intervals(feature_sets, start = start,
+            alive = alive, births = births, time_range = time_range)
+        steady_cornerpoints += [CornerPoint(0, b, d, object = object)
+            for object, b, d in zip(objects.tolist(), births.tolist(), deaths.tolist())]
+        return steady_cornerpoints
+
+    def get_steady_intervals(self, feature_sets, start = 0, alive = None, births = None,
+            dual = False, time_range = None):
+        """Sweeps the feature sets from the time index start and returns the
+        steady intervals as three arrays (objects, births, deaths), objects
+        still alive at the last time step having an infinite death.
+        alive and births are the boolean array of the objects alive at the
+        time index start-1 and the array of their births (None if start = 0);
+        they are modified by the sweep.
+        time_range replaces self.time_range if it is not None.
+        """
+        time_range = self.time_range if time_range is None else time_range
+        if alive is None:
+            n = len(self.get_object_labels(dual))
+            alive = np.zeros(n, dtype=bool)
+            births = np.full(n, np.nan)
+        return sweep_steady_intervals(feature_sets, time_range, alive, births, start = start)
+
+    def get_ranging_cornerpoints(self, steady_cornerpoints):
+        """Returns the list of ranging cornerpoints obtained by merging, for
+        each object, the steady cornerpoints of steady_cornerpoints.
+        """
+        return get_ranging_cornerpoints(steady_cornerpoints)
+
+    def get_feature_persistence(self, feature, dual=False, display_progress=False):
+        """Returns the steady and ranging persistence of a feature as a
+        FeaturePersistence. Recall that an object is steady if it lives
+        through consecutive sublevel sets of the filtration induced by the
+        weights of the hypergraph.
+        This method does not modify self, so it can be called concurrently
+        (see `self.get_features_persistence(...)`) as long as the filtration
+        itself is not modified.
         """
         # feature should be a function that takes a sub-hypergraph
         # (hypergraph-filtered) and gives the set of its featured sets
-        if TQDM_FOUND and display_progress:
-            self.feature_sets = [feature(self.get_sub_hypergraph(t, dual=dual)) for t in tqdm(self.time_range)]
-        else:
-            self.feature_sets = [feature(self.get_sub_hypergraph(t, dual=dual)) for t in self.time_range]
-        # compute cornerpoints:
-        self.steady_cornerpoints = []
-        current_feature_set = {} # dictionary
-        for i in range(len(self.time_range)):
-            new_feature_set = self.feature_sets[i]
-            for object, birth in current_feature_set.copy().items(): # use copy in order to safely delete items during iteration
-                if object not in new_feature_set:
-                    self.steady_cornerpoints.append(
-                        CornerPoint(0, birth, self.time_range[i],
-                            label = str(object), object = object
-                        ))
-                    current_feature_set.pop(object)
-
-            for object in new_feature_set:
-                if object not in current_feature_set:
-                    current_feature_set[object] = self.time_range[i]
-
-        for object, birth in current_feature_set.items():
-            self.steady_cornerpoints.append(
-                CornerPoint(0, birth, INFINITY,
-                    label = str(object), object = object
-                ))#object.name
-
-        self.steady_pd = PersistenceDiagram(cornerpoints = self.steady_cornerpoints,
-            xmax = self.time_range[-1])
+        time_range = tqdm(self.time_range) if TQDM_FOUND and display_progress else self.time_range
+        feature_sets = [get_feature_array(feature(self.get_sub_hypergraph(t, dual=dual))) for t in time_range]
+        return self.get_feature_persistence_from_sets(feature, dual, feature_sets)
+
+    def get_feature_persistence_from_sets(self, feature, dual, feature_sets, start = 0,
+            steady_cornerpoints = None, time_range = None):
+        """Returns the FeaturePersistence of the feature sets feature_sets
+        (see `self.get_steady_cornerpoints(...)` for start, steady_cornerpoints
+        and time_range).
+        """
+        time_range = self.time_range if time_range is None else time_range
+        feature_sets = tuple(feature_sets)
+        for feature_set in feature_sets: # shared by the result, so read-only
+            if isinstance(feature_set, np.ndarray):
+                feature_set.flags.writeable = False
+        steady_cornerpoints = tuple(self.get_steady_cornerpoints(feature_sets,
+            start = start, steady_cornerpoints = steady_cornerpoints, dual = dual,
+            time_range = time_range))
+        ranging_cornerpoints = tuple(self.get_ranging_cornerpoints(steady_cornerpoints))
+        return FeaturePersistence(feature, dual, tuple(time_range), feature_sets,
+            steady_cornerpoints,
+            PersistenceDiagram(cornerpoints = steady_cornerpoints,
+                xmax = time_range[-1], labels = self.get_object_labels(dual)),
+            ranging_cornerpoints,
+            PersistenceDiagram(cornerpoints = ranging_cornerpoints,
+                xmax = time_range[-1], labels = self.get_object_labels(dual)))
+
+    def get_s_feature_persistence(self, feature, s_values, dual=False, display_progress=False):
+        """Returns the persistence of an overlap feature taking a parameter s
+        (for instance `overlap_strict_hyperhub_feature`) for every s in
+        s_values, as a dictionary of the form s : FeaturePersistence.
+        At each time step, the sparse overlap of the sub-hypergraph is
+        computed once and its s-adjacencies for all the values of s are
+        obtained in a single pass.
+        """
+        time_range = tqdm(self.time_range) if TQDM_FOUND and display_progress else self.time_range
+        s_feature_sets = {s : [] for s in s_values}
+        for t in time_range:
+            overlap = self.get_sub_overlap(t, dual = dual)
+            overlap.get_s_adjacencies(s_values)
+            for s in s_values:
+                s_feature_sets[s].append(get_feature_array(feature(overlap, s = s)))
+        return {s : self.get_feature_persistence_from_sets(feature, dual, feature_sets)
+            for s, feature_sets in s_feature_sets.items()}
+
+    def get_top_k_feature_persistence(self, feature, k, dual=False, display_progress=False):
+        """Returns the cornerlines and the k most persistent proper
+        cornerpoints of the steady and ranging persistence of a feature as a
+        TopKFeaturePersistence, without building the full diagrams.
+        The steady sweep only keeps a heap of the k best intervals (and the
+        pairs (birth, death) that may still enter it, since the diagrams count
+        equal cornerpoints once); the ranging intervals are kept as arrays of
+        births and deaths over the object ids.
+        Ties are broken as in the full diagrams, by order of appearance.
+        """
+        n = len(self.get_object_labels(dual))
+        alive = np.zeros(n, dtype=bool)
+        births = np.full(n, np.nan)
+        ranging_births = np.full(n, INFINITY)
+        ranging_deaths = np.full(n, -INFINITY)
+        first_seq = np.full(n, -1, dtype=np.int64) # first appearance of an object in the steady diagram
+        heap = [] # entries (persistence, seq, birth, death, object)
+        seen = {} # (birth, death) : persistence of the pairs that appeared in the steady diagram
+        seq = 0
+
+        time_range = tqdm(self.time_range) if TQDM_FOUND and display_progress else self.time_range
+        feature_sets = (get_feature_array(feature(self.get_sub_hypergraph(t, dual=dual))) for t in time_range)
+        for t, dead, dead_births in sweep_steady_steps(feature_sets, self.time_range, alive, births):
+            merge_ranging_intervals(ranging_births, ranging_deaths, dead, dead_births, t)
+            dead_seqs = seq + np.arange(len(dead))
+            first_seq[dead] = np.where(first_seq[dead] < 0, dead_seqs, first_seq[dead])
+            seq += len(dead)
+
+            persistences = t - dead_births
+            if len(heap) < k:
+                candidates = np.arange(len(dead))
+            else:
+                candidates = np.flatnonzero(persistences >= heap[0][0]) if k > 0 else np.arange(0)
+            for i in candidates.tolist():
+                pair = (dead_births[i], t)
+                if pair in seen:
+                    continue
+                seen[pair] = persistences[i]
+                entry = (persistences[i], dead_seqs[i], dead_births[i], t, dead[i])
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, entry)
+            if 0 < k == len(heap) and len(seen) > 2 * k + 16:
+                seen = {pair : p for pair, p in seen.items() if p >= heap[0][0]}
+
+        cornerlines = np.flatnonzero(alive)
+        merge_ranging_intervals(ranging_births, ranging_deaths, cornerlines, births[cornerlines], INFINITY)
+        first_seq[cornerlines] = np.where(first_seq[cornerlines] < 0,
+            seq + np.arange(len(cornerlines)), first_seq[cornerlines])
+
+        steady_cornerpoints = [CornerPoint(0, float(b), float(d), object = int(object))
+            for _, _, b, d, object in sorted(heap, reverse = True)]
+        steady_cornerlines = [CornerPoint(0, b, INFINITY, object = object)
+            for object, b in zip(cornerlines.tolist(), births[cornerlines].tolist())]
+
+        # ranging diagram: objects in order of appearance, equal pairs counted once
+        objects = np.flatnonzero(first_seq >= 0)
+        objects = objects[np.argsort(first_seq[objects], kind="stable")]
+        ranging_cornerlines = [CornerPoint(0, b, INFINITY, object = object)
+            for object, b in zip(objects.tolist(), ranging_births[objects].tolist())
+            if ranging_deaths[object] == INFINITY]
+        objects = objects[ranging_deaths[objects] < INFINITY]
+        pairs = np.stack((ranging_births[objects], ranging_deaths[objects]), axis=1)
+        _, first_indices = np.unique(pairs, axis=0, return_index=True)
+        first_indices = np.sort(first_indices)
+        persistences = ranging_deaths[objects[first_indices]] - ranging_births[objects[first_indices]]
+        best = first_indices[np.lexsort((first_indices, persistences))[::-1][:k]]
+        ranging_cornerpoints = [CornerPoint(0, b, d, object = object)
+            for object, b, d in zip(objects[best].tolist(), ranging_births[objects[best]].tolist(),
+                ranging_deaths[objects[best]].tolist())]
+
+        return TopKFeaturePersistence(feature, dual, tuple(self.time_range), k,
+            tuple(steady_cornerlines), tuple(steady_cornerpoints),
+            tuple(ranging_cornerlines), tuple(ranging_cornerpoints), self.get_object_labels(dual))
+
+    def get_features_persistence(self, jobs, max_workers=None):
+        """Computes concurrently the persistence of several features on a
+        thread pool sharing this filtration, and returns the list of the
+        FeaturePersistence results.
+        jobs is a list of pairs (feature, dual).
+        """
+        with ThreadPoolExecutor(max_workers = max_workers) as executor:
+            return list(executor.map(lambda job: self.get_feature_persistence(*job), jobs))
+
+    def get_time_shards(self, nb_shards):
+        """Splits the time range into nb_shards shards of consecutive time
+        steps and returns the list of their (start, stop) indices.
+        """
+        bounds = np.linspace(0, len(self.time_range), min(nb_shards, len(self.time_range)) + 1)
+        bounds = np.round(bounds).astype(int).tolist()
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def get_steady_shard(self, feature, start, stop, dual=False):
+        """Returns the SteadyShard of a feature on the time steps
+        start, ..., stop-1 (see `src/sharded_persistence.py`). The feature is
+        only evaluated on these time steps.
+        """
+        time_range = np.asarray(self.time_range[start:stop], dtype=float)
+        feature_sets = [get_feature_array(feature(self.get_sub_hypergraph(t, dual=dual)))
+            for t in time_range.tolist()]
+        objects, births, deaths = self.get_steady_intervals(feature_sets, dual = dual,
+            time_range = time_range.tolist())
+        return SteadyShard(start, time_range, objects, births, deaths)
+
+    def get_persistence_from_shards(self, feature, dual, shards):
+        """Returns the FeaturePersistence obtained by merging shards covering
+        the whole time range. Its feature_sets are None.
+        The ranging cornerpoints are in the order of `get_ranging_cornerpoints`,
+        i.e. of the first appearance of their objects in the steady diagram.
+        """
+        steady_intervals = merge_steady_shards(shards)
+        steady_cornerpoints = tuple(CornerPoint(0, b, d, object = object)
+            for object, b, d in zip(*[a.tolist() for a in steady_intervals]))
+        _, first_indices = np.unique(steady_intervals[0], return_index=True)
+        order = np.argsort(first_indices, kind="stable") # the ranging intervals are sorted by object
+        ranging_cornerpoints = tuple(CornerPoint(0, b, d, object = object)
+            for object, b, d in zip(*[a[order].tolist() for a in merge_ranging_shards(shards)]))
+        return FeaturePersistence(feature, dual, tuple(self.time_range), None,
+            steady_cornerpoints,
+            PersistenceDiagram(cornerpoints = steady_cornerpoints,
+                xmax = self.time_range[-1], labels = self.get_object_labels(dual)),
+            ranging_cornerpoints,
+            PersistenceDiagram(cornerpoints = ranging_cornerpoints,
+                xmax = self.time_range[-1], labels = self.get_object_labels(dual)))
+
+    def get_sharded_feature_persistence(self, feature, nb_shards, dual=False, max_workers=None):
+        """Computes the shards of a feature in separate local processes and
+        returns their merged FeaturePersistence. feature must be picklable
+        (for instance a function of `src/edge_features.py`).
+        The filtration is sent once to each worker process, and each shard
+        only sends its time indices.
+        """
+        time_shards = self.get_time_shards(nb_shards)
+        with ProcessPoolExecutor(max_workers = max_workers, initializer = set_sharded_filtration,
+                initargs = (self,)) as executor:
+            shards = list(executor.map(get_sharded_steady_shard, *zip(*[(feature, start, stop, dual)
+                for start, stop in time_shards])))
+        return self.get_persistence_from_shards(feature, dual, shards)
+
+    def compute_feature_steady_persistence(self, feature, above_max_diagonal_gap=False,
+            gap_number=0, display_progress=False, dual=False):
+        """Compute steady persistence of a feature and store it in
+        self.feature_persistence, self.steady_cornerpoints and self.steady_pd
+        (and the GapSelection of the gap gap_number in self.steady_gap if
+        above_max_diagonal_gap).
+        See `self.get_feature_persistence(...)` for a version that does not
+        modify self.
+        """
+        self.set_feature_persistence(self.get_feature_persistence(feature, dual = dual,
+            display_progress = display_progress))
         if above_max_diagonal_gap:
-            _,_ = self.steady_pd.get_nth_widest_gap(n = gap_number)
+            self.steady_gap = self.steady_pd.get_gap_selection(gap_number)
             self.steady_gap_number = gap_number
 
+    def set_feature_persistence(self, feature_persistence):
+        """Stores the steady part of feature_persistence in self (and its
+        ranging part if ranging persistence was already computed).
+        """
+        self.feature_persistence = feature_persistence
+        self.feature = feature_persistence.feature
+        self.feature_dual = feature_persistence.dual
+        self.feature_sets = list(feature_persistence.feature_sets)
+        self.steady_cornerpoints = list(feature_persistence.steady_cornerpoints)
+        self.steady_pd = feature_persistence.steady_pd
+        if hasattr(self, "ranging_cornerpoints"):
+            self.compute_ranging_from_steady_persistence()
 
     def compute_ranging_from_steady_persistence(self, above_max_diagonal_gap=False, gap_number=0):
         """Compute ranging persistence of a feature from the previous
         steady persistence computation. Make sure that this function is
         called after calling `self.compute_feature_steady_persistence(...)`
         """
-        self.ranging_cornerpoints = []
-        ranging_corner_dict = {}
-        for cp in self.steady_cornerpoints:
-            if cp.object not in ranging_corner_dict:
-                ranging_corner_dict[cp.object] = (cp.birth, cp.death)
-            else:
-                (b,d) = ranging_corner_dict[cp.object]
-                ranging_corner_dict[cp.object] = (min(b,cp.birth) , max(d,cp.death))
+        self.ranging_cornerpoints = list(self.feature_persistence.ranging_cornerpoints)
+        self.ranging_pd = self.feature_persistence.ranging_pd
+        if above_max_diagonal_gap:
+            self.ranging_gap = self.ranging_pd.get_gap_selection(gap_number)
+            self.ranging_gap_number = gap_number
 
-        for object, (b,d) in ranging_corner_dict.items():
-            self.ranging_cornerpoints.append(
-                CornerPoint(0, b, d,
-                    label = str(object), object = object
-                ))
+    def update_feature_persistence(self, feature_sets, start, time_indices):
+        """Updates the last computed persistence: feature_sets (the previous
+        feature sets aligned with the current time range) are recomputed at
+        the time indices time_indices, and the steady and ranging persistence
+        are recomputed from the time index start, assuming that nothing
+        changed before start.
+        Used by `self.append_edges(...)` and `self.update_edge_weights(...)`.
+        """
+        for i in time_indices:
+            feature_sets[i] = get_feature_array(self.feature(
+                self.get_sub_hypergraph(self.time_range[i], dual=self.feature_dual)))
+        self.set_feature_persistence(self.get_feature_persistence_from_sets(
+            self.feature, self.feature_dual, feature_sets, start = start,
+            steady_cornerpoints = self.feature_persistence.steady_cornerpoints))
 
-        self.ranging_pd = PersistenceDiagram(cornerpoints = self.ranging_cornerpoints,
-            xmax = self.time_range[-1])
-        if above_max_diagonal_gap:
-            _,_ = self.ranging_pd.get_nth_widest_gap(n = gap_number)
-            self.ranging_gap_number = gap_numb
+    def append_edges(self, edges, edge_weights, node_weights = {}):
+        """Appends new hyperedges to the filtration and updates the time range
+        and the last computed persistence diagrams incrementally.
+        Unlike the other methods, it modifies the filtration, so it must not
+        be called during concurrent computations on it.
+
+        Parameters
+        ----------
+
+        edges : dictionary
+            dictionary of the form edge : set of nodes. The edges must be new
+            (use `self.update_edge_weights(...)` to move existing edges).
+        edge_weights : dictionary
+            weights of the new edges (and possibly of their new nodes in
+            node_weights), they must not be smaller than self.time_range[-1].
+        node_weights : dictionary
+            weights of the new nodes. Nodes already in the filtration cannot
+            be given a weight, since the sub-hypergraphs before the appended
+            times would change.
+        """
+        existing_edges = [edge for edge in dict.fromkeys(list(edges) + list(edge_weights)) if edge in self.edge_ids]
+        if existing_edges:
+            raise ValueError("Edges already in the filtration cannot be appended: {}".format(existing_edges))
+        existing_nodes = [node for node in node_weights if node in self.node_ids]
+        if existing_nodes:
+            raise ValueError("Nodes already in the filtration cannot be given a weight: {}".format(existing_nodes))
+        last_time = self.time_range[-1]
+        new_times = {float(w) for w in edge_weights.values()} | {float(w) for w in node_weights.values()}
+        if any(w < last_time for w in new_times):
+            raise ValueError("Appended weights must not be smaller than the last time of the filtration")
+
+        incidences = [(edge, node)
+            for edge, nodes in zip(self.intern_edges(edges.keys()), edges.values())
+            for node in self.intern_nodes(nodes)]
+        self.H.add_incidences_from(incidences)
+        self.set_weights(edge_weights, node_weights)
+        self.append_incidence_matrices(incidences)
+        start = len(self.time_range) - 1 if last_time in new_times else len(self.time_range)
+        self.time_range = list(self.time_range) + sorted(w for w in new_times if w > last_time)
+
+        if hasattr(self, "feature_persistence"):
+            feature_sets = list(self.feature_persistence.feature_sets[:start]) \
+                + [None] * (len(self.time_range) - start)
+            self.update_feature_persistence(feature_sets, start, range(start, len(self.time_range)))
+
+    def update_edge_weights(self, edge_weights):
+        """Changes the weights of some existing edges and updates the time
+        range and the last computed persistence diagrams. Only the time steps
+        between the old and the new weight of an edge are recomputed.
+        New weight values are inserted in the time range, old values are kept.
+        Like `self.append_edges(...)`, it modifies the filtration.
+        """
+        time_range = list(self.time_range)
+        feature_sets = list(self.feature_persistence.feature_sets) \
+            if hasattr(self, "feature_persistence") else None
+        windows = []
+        for edge, weight in zip(self.intern_edges(edge_weights.keys()), edge_weights.values()):
+            old_weight = self.edge_weights[edge] if edge < len(self.edge_weights) else np.nan
+            if np.isnan(old_weight): # edges without weights are never in sub-hypergraphs
+                old_weight = INFINITY
+            windows.append((min(old_weight, weight), max(old_weight, weight)))
+            self.set_weights({self.edge_labels[edge] : weight})
+            i = bisect_left(time_range, weight)
+            if i == len(time_range) or time_range[i] != weight:
+                time_range.insert(i, weight)
+                if feature_sets is not None:
+                    feature_sets.insert(i, None)
+        self.time_range = time_range
+        if len(self.edge_labels) > self.incidence.shape[0]: # new edges without nodes
+            self.append_incidence_matrices([])
+
+        if feature_sets is not None:
+            time_indices = [i for i, t in enumerate(self.time_range)
+                if feature_sets[i] is None or any(lo <= t < hi for lo, hi in windows)]
+            if time_indices:
+                self.update_feature_persistence(feature_sets, time_indices[0], time_indices)
+
+    def get_thresholded_feature_persistence(self, values_function, thresholds,
+            display_progress=False, dual=False):
+        """Returns the steady and ranging persistence of the features
+        {object : values_function(H)[object] > t} for every t in thresholds,
+        as a dictionary of the form threshold : FeaturePersistence.
+        values_function (for instance `compute_max_originality_values`) is
+        evaluated once per time step, and the thresholding is done for all
+        the thresholds at once. thresholds may also be a single threshold.
+        The feature of the results is None.
+        """
+        thresholds = np.atleast_1d(np.asarray(thresholds, dtype=float))
+        time_range = tqdm(self.time_range) if TQDM_FOUND and display_progress else self.time_range
+        thresholds_feature_sets = [[] for _ in thresholds]
+        for t in time_range:
+            values = values_function(self.get_sub_hypergraph(t, dual=dual))
+            objects = get_feature_array(values.keys())
+            above = np.fromiter((values[object] for object in objects.tolist()), dtype=float,
+                count=len(objects))[:, None] > thresholds[None, :]
+            for j in range(len(thresholds)):
+                thresholds_feature_sets[j].append(objects[above[:, j]])
+
+        return {threshold : self.get_feature_persistence_from_sets(None, dual, feature_sets)
+            for threshold, feature_sets in zip(thresholds.tolist(), thresholds_feature_sets)}
+
+    def compute_thresholded_feature_persistence(self, values_function, thresholds,
+            display_progress=False, dual=False):
+        """Compute steady and ranging persistence of the features
+        {object : values_function(H)[object] > t} for every t in thresholds
+        (see `self.get_thresholded_feature_persistence(...)`).
+        Results are stored in self.thresholds_steady_pd and
+        self.thresholds_ranging_pd, two dictionaries of the form
+        threshold : PersistenceDiagram.
+        """
+        results = self.get_thresholded_feature_persistence(values_function, thresholds,
+            display_progress = display_progress, dual = dual)
+        self.thresholds_steady_pd = {t : r.steady_pd for t, r in results.items()}
+        self.thresholds_ranging_pd = {t : r.ranging_pd for t, r in results.items()}
 
     def plot_filtration(self, nb_plot = None, dual = False, collapse = False,
             with_node_labels = True, with_edge_labels = True, pos = None,
@@ -174,7 +847,7 @@ class HyperGraphFiltration:
         """Plots all the sub hypergraphs of self.H given by considering the sublevel
         sets of the function defined on the weighted edges and nodes
         """
-        maxH = self.get_sub_hypergraph(self.time_range[-1], dual=dual)
+        maxH = self.get_labeled_hypergraph(self.get_sub_hypergraph(self.time_range[-1], dual=dual), dual=dual)
         if pos is None:
             if collapse:
                 pos = hnx.drawing.rubber_band.layout_node_link(
@@ -216,7 +889,7 @@ class HyperGraphFiltration:
                 t = self.time_range[-1]
             else:
                 t = self.time_range[int(i*(n-1.0)/(nb_plot-1.0))]
-            sub_H = self.get_sub_hypergraph(t, dual=dual)
+            sub_H = self.get_labeled_hypergraph(self.get_sub_hypergraph(t, dual=dual), dual=dual)
             draw_sub_hypergraph(sub_H, collapse = collapse, pos = pos, ax = self.ax_arr[i],
                         title = "t="+str(t),
                         with_node_labels = with_node_labels,
@@ -224,6 +897,84 @@ class HyperGraphFiltration:
                         edges_kwargs=edges_kwargs, nodes_kwargs=nodes_kwargs,
                         node_labels_kwargs=node_labels_kwargs, edge_labels_kwargs=edge_labels_kwargs)
 
+class BatchHyperGraphFiltration(HyperGraphFiltration):
+    """Filtrations of a same hypergraph by several weightings of its edges.
+    The structure of the hypergraph (its sparse incidence matrix and its
+    edge-overlap matrix) is computed once and shared by all the weightings,
+    and the features are overlap features taking a SubHypergraphOverlap (see
+    `src/edge_features.py`). Nodes are not weighted.
+    The inherited methods act on the first weighting.
+
+    Attributes
+    ----------
+
+    edge_weightings : numpy array
+        array of shape (number of weightings, number of edges),
+        edge_weightings[k, i] being the weight of the edge of id i in the k-th
+        weighting. No weight for an edge is encoded as nan.
+        The weightings are given as a list of dictionaries of the form
+        original edge : weight, or as an array of shape (number of
+        weightings, len(edges)) whose columns are the weights of the original
+        edges of the list edges.
+    weightings_time_range : list or None
+        time range shared by all the weightings. If None, the time range of
+        a weighting is the sorted list of its weights.
+    """
+    def __init__(self, hnx_hypergraph = None, edge_weightings = [{}], time_range = None, edges = None):
+        HyperGraphFiltration.__init__(self, hnx_hypergraph)
+        if edges is not None:
+            weights = np.atleast_2d(np.asarray(edge_weightings, dtype=float))
+            if weights.shape[1] != len(edges):
+                raise ValueError("Specify one weight per edge of edges in each weighting")
+            edge_weightings = [dict(zip(edges, row)) for row in weights.tolist()]
+        self.edge_weightings = np.full((len(edge_weightings), len(self.edge_labels)), np.nan)
+        for k, weighting in enumerate(edge_weightings):
+            unknown_edges = [edge for edge in weighting if edge not in self.edge_ids]
+            if unknown_edges:
+                raise ValueError("Edges not in the hypergraph: {}".format(unknown_edges))
+            self.edge_weightings[k, [self.edge_ids[edge] for edge in weighting]] = list(weighting.values())
+        self.weightings_time_range = time_range
+        self.edge_weights = self.edge_weightings[0].copy()
+        self.time_range = self.get_weighting_time_range(0)
+
+    def get_weighting_time_range(self, k):
+        """Returns the time range of the k-th weighting.
+        """
+        if self.weightings_time_range is not None:
+            return list(self.weightings_time_range)
+        weights = self.edge_weightings[k]
+        return sorted(set(weights[~np.isnan(weights)].tolist()))
+
+    def get_weighting_feature_persistence(self, feature, k, dual=False):
+        """Returns the FeaturePersistence of the overlap feature feature for
+        the k-th weighting.
+        """
+        weights = self.edge_weightings[k]
+        time_range = self.get_weighting_time_range(k)
+        feature_sets = [get_feature_array(feature(self.get_masked_overlap(weights <= t, dual = dual)))
+            for t in time_range]
+        return self.get_feature_persistence_from_sets(feature, dual, feature_sets,
+            time_range = time_range)
+
+    def get_batch_feature_persistence(self, feature, dual=False, max_workers=None):
+        """Returns the list of the FeaturePersistence of the overlap feature
+        feature for all the weightings, computed in separate local processes.
+        feature must be picklable (for instance a function of
+        `src/edge_features.py`).
+        The filtration, with its edge-overlap matrix, is sent once to each
+        worker process, and each weighting only sends its index.
+        """
+        if not dual:
+            self.get_edge_overlap() # computed once, not in every worker
+        with ProcessPoolExecutor(max_workers = max_workers, initializer = set_sharded_filtration,
+                initargs = (self,)) as executor:
+            results = list(executor.map(get_sharded_weighting_feature_persistence,
+                *zip(*[(feature, k, dual) for k in range(len(self.edge_weightings))])))
+        for result in results: # the read-only flags are not pickled
+            for feature_set in result.feature_sets:
+                feature_set.flags.writeable = False
+        return results
+
 def draw_sub_hypergraph(hypergraph, collapse = False, pos = None, ax = None,
         title = None, with_node_labels = True, with_edge_labels = True,
         edges_kwargs={}, nodes_kwargs={},
@@ -0,0 +1,677 @@
+# Out-of-core hypergraph filtration
+# The incidence data and the labels of the hypergraph are kept on the local
+# disk in chunks of edges sorted by weight (i.e. by birth in the filtration).
+# The overlaps of the pairs of objects (edges, or nodes for the dual) are
+# computed once per orientation, in batches, into a stream of pairs sorted by
+# birth that is also kept on disk. The sweep pages the chunks and the pairs in
+# as they are born, and only keeps per-object aggregates in memory (sizes,
+# numbers of s-neighbors, maximal and total overlaps...), from which the
+# overlap features of `src/edge_features.py` are computed without any overlap
+# matrix. The memory limit sets the sizes of the batches and of the pages.
+import inspect
+import os
+import pickle
+import tempfile
+import time
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+import scipy.sparse as sp
+from numpy import inf as INFINITY
+
+from src.persistence import CornerPoint
+from src.persistence import PersistenceDiagram
+from src.edge_features import overlap_exclusivity_feature
+from src.edge_features import overlap_local_max_size_feature
+from src.edge_features import overlap_max_originality_feature
+from src.edge_features import overlap_mean_originality_feature
+from src.edge_features import overlap_strict_hyperhub_feature
+from src.hypergraph_filtration import FeaturePersistence
+from src.hypergraph_filtration import get_ranging_cornerpoints
+from src.hypergraph_filtration import intern_objects
+from src.hypergraph_filtration import sweep_steady_intervals
+
+TQDM_FOUND = True
+try:
+    from tqdm import tqdm
+except ImportError:
+    TQDM_FOUND = False
+
+PAIR_ARRAYS = ("steps", "a", "b", "values") # arrays of a stream of pairs (see `write_pairs`)
+PAIR_NBYTES = 128 # memory of a pair in a batch or a page: its arrays, their sorted copies and masks
+OBJECT_NBYTES = 24 # memory of an object in the steady sweep: alive, births and feature set
+
+STREAMED_FEATURES = {
+    overlap_strict_hyperhub_feature : "strict_hyperhub",
+    overlap_local_max_size_feature : "local_max_size",
+    overlap_exclusivity_feature : "exclusivity",
+    overlap_max_originality_feature : "max_originality",
+    overlap_mean_originality_feature : "mean_originality"}
+
+def get_streamed_feature(feature):
+    """Returns the name and the parameters (with their default values) of the
+    overlap feature feature, a function of `src/edge_features.py` or a
+    functools.partial of one with keyword arguments. Raises a ValueError if
+    the feature cannot be computed from the aggregates of OverlapAggregates.
+    """
+    function, args, keywords = (feature.func, feature.args, feature.keywords) \
+        if isinstance(feature, partial) else (feature, (), {})
+    if function not in STREAMED_FEATURES or len(args) > 0:
+        raise ValueError("Only the overlap features of src/edge_features.py (with keyword arguments) "
+            "can be computed out of core")
+    arguments = inspect.signature(function).bind_partial(**keywords)
+    arguments.apply_defaults()
+    parameters = {key : value for key, value in arguments.arguments.items() if key != "overlap"}
+    if parameters.get("s", 1) < 1:
+        raise ValueError("s must be at least 1")
+    if STREAMED_FEATURES[function] == "exclusivity" and parameters["s"] != 1:
+        raise ValueError("The exclusivity feature can only be computed out of core for s = 1")
+    return STREAMED_FEATURES[function], parameters
+
+def get_ragged_ranges(starts, lengths):
+    """Returns the concatenation of the ranges start, ..., start + length - 1
+    of the arrays starts and lengths.
+    """
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.repeat(starts - offsets, lengths) + np.arange(np.sum(lengths), dtype=np.int64)
+
+def get_batches(counts, max_count):
+    """Returns the list of the (start, stop) of the consecutive batches of
+    range(len(counts)) whose sums of counts are at most max_count. Raises a
+    MemoryError if a single count exceeds max_count.
+    """
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    batches, start = [], 0
+    while start < len(counts):
+        stop = int(np.searchsorted(bounds, bounds[start] + max_count, side="right")) - 1
+        if stop == start:
+            raise MemoryError("The {} pairs of a single object exceed the memory limit of {} pairs"
+                .format(counts[start], max_count))
+        batches.append((start, stop))
+        start = stop
+    return batches
+
+class OverlapAggregates:
+    """Per-object state of the sweep of an OutOfCoreHyperGraphFiltration for
+    an overlap feature of `src/edge_features.py`, updated with the new edges
+    and the new pairs of objects of each time step. The objects are the edges
+    (or the nodes if dual) and their members are their nodes (or edges).
+    The arrays that the feature does not need are None.
+
+    Attributes
+    ----------
+
+    name : string
+        name of the feature (see STREAMED_FEATURES).
+    s, t : int, float
+        parameters of the feature: the s-neighbors of an object share at least
+        s members with it, and t is the threshold of the originalities.
+    dual : bool
+        True if the objects are the nodes.
+    sizes : numpy array
+        numbers of members of the objects in the sub-hypergraph (0 for the
+        objects that are not in it).
+    nb_neighbors : numpy array
+        numbers of s-neighbors of the objects.
+    max_overlap, sum_overlap : numpy arrays
+        maximal and total overlaps of the objects with their 1-neighbors.
+    neighbor_max_size : numpy array
+        maximal size of the s-neighbors of the edges (the sizes of the nodes
+        change with time, see neighbor_max).
+    nb_exclusive_members : numpy array
+        numbers of members of the objects contained in no other object.
+    node_degrees, single_edges : numpy arrays
+        degrees of the nodes, and edge of each node of degree 1 (for the
+        exclusivity of edges).
+    neighbor_max : numpy array
+        maximum over the s-neighbors of the objects of their numbers of
+        s-neighbors (strict hyperhub) or of their sizes (local maximal size of
+        nodes). It depends on the neighbors of the neighbors, so it is
+        recomputed at each time step from all the pairs born.
+    """
+    def __init__(self, name, parameters, nb_objects, nb_nodes, dual = False):
+        self.name = name
+        self.s = parameters.get("s", 1)
+        self.t = parameters.get("t")
+        self.dual = dual
+        zeros = lambda needed, n = nb_objects: np.zeros(n, dtype=np.int64) if needed else None
+        self.sizes = zeros(True)
+        self.nb_neighbors = zeros(name in ("strict_hyperhub", "local_max_size", "mean_originality"))
+        self.max_overlap = zeros(name == "max_originality")
+        self.sum_overlap = zeros(name == "mean_originality")
+        self.neighbor_max_size = zeros(name == "local_max_size" and not dual)
+        self.nb_exclusive_members = zeros(name == "exclusivity")
+        self.node_degrees = zeros(name == "exclusivity" and not dual, nb_nodes)
+        self.single_edges = zeros(name == "exclusivity" and not dual, nb_nodes)
+        self.neighbor_max = zeros(name == "strict_hyperhub" or (name == "local_max_size" and dual))
+
+    def get_nbytes(self):
+        return sum(array.nbytes for array in vars(self).values() if isinstance(array, np.ndarray))
+
+    def add_edges(self, first_edge, indptr, indices):
+        """Updates the state with the edges first_edge, first_edge + 1, ...
+        born at this time step, of csr incidence (indptr, indices).
+        """
+        sizes = np.diff(indptr)
+        edges = np.repeat(np.arange(first_edge, first_edge + len(sizes)), sizes)
+        if self.dual:
+            self.sizes += np.bincount(indices, minlength=len(self.sizes))
+            if self.nb_exclusive_members is not None: # the members of degree 1 are the edges of size 1
+                self.nb_exclusive_members += np.bincount(indices[sizes[edges - first_edge] == 1],
+                    minlength=len(self.sizes))
+            return
+        self.sizes[first_edge : first_edge + len(sizes)] = sizes
+        if self.nb_exclusive_members is not None:
+            counts = np.bincount(indices, minlength=len(self.node_degrees))
+            degrees = self.node_degrees + counts
+            # the edge of a node of degree 1 loses it, a node of degree 0 in a single new edge becomes exclusive
+            shared = (self.node_degrees == 1) & (counts > 0)
+            self.nb_exclusive_members -= np.bincount(self.single_edges[shared], minlength=len(self.sizes))
+            exclusive = ((self.node_degrees == 0) & (counts == 1))[indices]
+            self.single_edges[indices[exclusive]] = edges[exclusive]
+            self.nb_exclusive_members += np.bincount(edges[exclusive], minlength=len(self.sizes))
+            self.node_degrees = degrees
+
+    def add_pairs(self, a, b, values):
+        """Updates the state with the pairs of objects (a, b) whose overlap
+        became values at this time step (from values - 1 if dual, else from 0).
+        """
+        previous = values - 1 if self.dual else 0
+        crossing = (previous < self.s) & (values >= self.s) # new s-neighbors
+        n = len(self.sizes)
+        if self.nb_neighbors is not None:
+            self.nb_neighbors += np.bincount(a[crossing], minlength=n) + np.bincount(b[crossing], minlength=n)
+        if self.max_overlap is not None:
+            np.maximum.at(self.max_overlap, a, values)
+            np.maximum.at(self.max_overlap, b, values)
+        if self.sum_overlap is not None:
+            increments = values - previous
+            self.sum_overlap += np.bincount(a, weights=increments, minlength=n).astype(np.int64) \
+                + np.bincount(b, weights=increments, minlength=n).astype(np.int64)
+        if self.neighbor_max_size is not None:
+            np.maximum.at(self.neighbor_max_size, a[crossing], self.sizes[b[crossing]])
+            np.maximum.at(self.neighbor_max_size, b[crossing], self.sizes[a[crossing]])
+
+    def add_neighbor_pairs(self, a, b, values):
+        """Updates self.neighbor_max with pairs of objects (a, b) born at this
+        time step or before, whose overlap became values when they were born.
+        """
+        previous = values - 1 if self.dual else 0
+        crossing = (previous < self.s) & (values >= self.s) # each pair of s-neighbors once
+        a, b = a[crossing], b[crossing]
+        neighbor_values = self.nb_neighbors if self.name == "strict_hyperhub" else self.sizes
+        np.maximum.at(self.neighbor_max, a, neighbor_values[b])
+        np.maximum.at(self.neighbor_max, b, neighbor_values[a])
+
+    def get_feature_array(self):
+        """Returns the array of the ids of the featured objects, as the
+        overlap feature on the SubHypergraphOverlap of the sub-hypergraph.
+        """
+        if self.name == "strict_hyperhub":
+            return np.flatnonzero((self.nb_neighbors > 0) & (self.nb_neighbors > self.neighbor_max))
+        if self.name == "local_max_size":
+            neighbor_max = self.neighbor_max if self.dual else self.neighbor_max_size
+            return np.flatnonzero((self.nb_neighbors > 0) & (self.sizes >= neighbor_max))
+        if self.name == "exclusivity":
+            return np.flatnonzero(self.nb_exclusive_members > 0)
+        objects = np.flatnonzero(self.sizes > 0)
+        if self.name == "max_originality":
+            values = 1.0 - self.max_overlap[objects] / self.sizes[objects]
+        else:
+            neighbors = self.nb_neighbors[objects]
+            values = np.ones(len(objects))
+            has_neighbors = neighbors > 0
+            values[has_neighbors] = 1.0 - self.sum_overlap[objects][has_neighbors] \
+                / (neighbors * self.sizes[objects])[has_neighbors]
+        return objects[values > self.t]
+
+class ChunkedEdgeLabels:
+    """Table of the original edges of an OutOfCoreHyperGraphFiltration,
+    indexed by edge ids and read from the chunks on disk when needed. The
+    files of the last decoded edges are kept in a LRU cache of cache_size
+    chunks, and `get_labels` decodes many edges reading each file once.
+    """
+    def __init__(self, filtration, cache_size = 8):
+        self.filtration = filtration
+        self.cache_size = cache_size
+        self.positions = OrderedDict() # sorted chunk index : input positions of its edges
+        self.labels = OrderedDict() # input chunk index : original edges
+
+    def __len__(self):
+        return self.filtration.nb_edges
+
+    def get_cached(self, cache, index, load):
+        if index in cache:
+            cache.move_to_end(index)
+        else:
+            cache[index] = load(index)
+            while len(cache) > self.cache_size:
+                cache.popitem(last = False)
+        return cache[index]
+
+    def load_input_labels(self, input_index):
+        with open(self.filtration.get_path("input_labels_{}.pkl".format(input_index)), "rb") as file:
+            return pickle.load(file)
+
+    def get_position(self, edge):
+        """Returns the input position of edge.
+        """
+        chunk_size = self.filtration.chunk_size
+        positions = self.get_cached(self.positions, edge // chunk_size,
+            lambda index: self.filtration.load_chunk(index)["positions"])
+        return int(positions[edge % chunk_size])
+
+    def __getitem__(self, edge):
+        chunk_size = self.filtration.chunk_size
+        position = self.get_position(edge)
+        return self.get_cached(self.labels, position // chunk_size,
+            self.load_input_labels)[position % chunk_size]
+
+    def get_labels(self, edges):
+        """Returns the dictionary edge : original edge of edges, reading the
+        files of each chunk once.
+        """
+        chunk_size = self.filtration.chunk_size
+        positions = {edge : self.get_position(edge) for edge in sorted(set(edges))}
+        return {edge : self.get_cached(self.labels, position // chunk_size,
+                self.load_input_labels)[position % chunk_size]
+            for edge, position in sorted(positions.items(), key = lambda item: item[1])}
+
+
+class OutOfCoreHyperGraphFiltration:
+    """Hypergraph filtration whose edges are stored on disk in chunks sorted
+    by weight. Edges get ids in the order of their weights, so the
+    sub-hypergraph at any time is made of a prefix of the chunks, and a pair
+    of objects is born with the edge that makes them overlap (or, if dual,
+    with each edge that increases their overlap). The pairs are written once
+    per orientation into a stream sorted by edge id (see `get_pair_stream`),
+    and the sweep pages the chunks and the pairs in as they are born to
+    update the per-object OverlapAggregates of the feature. Features are the
+    overlap features of `src/edge_features.py` (see `get_streamed_feature`).
+    Nodes are not weighted and are kept in memory.
+
+    Attributes
+    ----------
+
+    directory : string
+        directory of the chunk and pair files. If no directory is given, a
+        temporary directory is used and removed by `close` (or when the
+        filtration is garbage collected).
+    chunk_size : int
+        number of edges per chunk.
+    memory_limit : int
+        maximal number of bytes of the arrays of the sweep (the diagrams it
+        returns are not counted). The memory left by the per-object state and
+        the chunks sets the number of pairs of the batches that write the
+        pair streams and of the pages that read them (see `get_max_pairs`).
+    nb_edges : int
+        number of edges.
+    edge_labels : ChunkedEdgeLabels
+        original edges indexed by edge ids.
+    node_labels : list
+        original nodes indexed by node ids.
+    weights : numpy array
+        sorted weights of the edges (weights[i] is the weight of edge i).
+    time_range : list
+        times of the filtration.
+    max_chunk_nbytes : int
+        number of bytes of the largest chunk.
+    pair_streams : dictionary
+        dual : list of the files of the pairs of objects (see `write_pairs`),
+        written by `get_pair_stream`.
+    pair_arrays : dictionary
+        name : memory-mapped arrays of the pair files read (see `load_pairs`).
+    statistics : dictionary
+        throughput of the last call to `write_edges` or
+        `get_feature_persistence`, and memory of the arrays of its sweep.
+    """
+    def __init__(self, directory = None, chunk_size = 100000, memory_limit = 2**30):
+        self.temporary_directory = tempfile.TemporaryDirectory(prefix = "hypergraph_filtration_") \
+            if directory is None else None
+        self.directory = self.temporary_directory.name if directory is None else directory
+        os.makedirs(self.directory, exist_ok = True)
+        self.chunk_size = chunk_size
+        self.memory_limit = memory_limit
+        self.nb_edges = 0
+        self.nb_chunks = 0
+        self.edge_labels = ChunkedEdgeLabels(self)
+        self.node_labels = []
+        self.node_ids = {}
+        self.weights = np.zeros(0)
+        self.time_range = [0.0]
+        self.max_chunk_nbytes = 0
+        self.pair_streams = {}
+        self.pair_arrays = {}
+        self.statistics = {}
+
+    def get_path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def close(self):
+        """Removes the temporary directory of the chunks, if any.
+        """
+        if self.temporary_directory is not None:
+            self.temporary_directory.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def load_chunk(self, chunk_index):
+        """Returns the chunk chunk_index, a dictionary of arrays: weights,
+        positions (input positions of the edges), indptr and indices (csr
+        incidence of the edges of the chunk).
+        """
+        with np.load(self.get_path("chunk_{}.npz".format(chunk_index))) as data:
+            return {key : data[key] for key in data.files}
+
+    def write_edges(self, edges):
+        """Writes the edges on disk, sorted by weight, in chunks of
+        self.chunk_size edges.
+        edges is an iterable of triples (edge, nodes, weight); it is read
+        once, one chunk at a time.
+        Only the weights, the sizes of the edges and the nodes are kept in
+        memory; the incidence of the edges is written in input order, then
+        gathered in sorted order from a memory-mapped file.
+        """
+        start_time = time.time()
+        self.remove_pair_streams()
+        indices_path = self.get_path("input_indices.bin")
+        weights = []
+        sizes = []
+        with open(indices_path, "wb") as indices_file:
+            input_index, labels, chunk_indices = 0, [], []
+            for edge, nodes, weight in edges:
+                node_ids = np.unique(np.asarray(intern_objects(nodes, self.node_labels, self.node_ids),
+                    dtype=np.int32))
+                labels.append(edge)
+                chunk_indices.append(node_ids)
+                weights.append(weight)
+                sizes.append(len(node_ids))
+                if len(labels) == self.chunk_size:
+                    self.write_input_chunk(indices_file, input_index, labels, chunk_indices)
+                    input_index, labels, chunk_indices = input_index + 1, [], []
+            if len(labels) > 0:
+                self.write_input_chunk(indices_file, input_index, labels, chunk_indices)
+
+        weights = np.asarray(weights, dtype=float)
+        sizes = np.asarray(sizes, dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        order = np.argsort(weights, kind="stable")
+        self.nb_edges = len(weights)
+        self.weights = weights[order]
+        input_indices = np.memmap(indices_path, dtype=np.int32, mode="r") \
+            if offsets[-1] > 0 else np.zeros(0, dtype=np.int32)
+        self.nb_chunks, self.max_chunk_nbytes = 0, 0
+        for start in range(0, self.nb_edges, self.chunk_size):
+            positions = order[start : start + self.chunk_size]
+            chunk_sizes = sizes[positions]
+            indptr = np.concatenate(([0], np.cumsum(chunk_sizes)))
+            gather = np.repeat(offsets[positions] - indptr[:-1], chunk_sizes) + np.arange(indptr[-1])
+            np.savez(self.get_path("chunk_{}.npz".format(self.nb_chunks)),
+                weights = self.weights[start : start + self.chunk_size], positions = positions,
+                indptr = indptr, indices = np.asarray(input_indices[gather], dtype=np.int32))
+            self.max_chunk_nbytes = max(self.max_chunk_nbytes, self.weights[start : start + self.chunk_size].nbytes
+                + positions.nbytes + indptr.nbytes + 4 * indptr[-1])
+            self.nb_chunks += 1
+        del input_indices
+        os.remove(indices_path)
+        self.compute_time_range_from_weights()
+
+        seconds = time.time() - start_time
+        self.statistics = {"edges" : self.nb_edges, "chunks" : self.nb_chunks,
+            "seconds" : seconds, "edges_per_second" : self.nb_edges / seconds if seconds > 0 else INFINITY}
+
+    def write_input_chunk(self, indices_file, input_index, labels, chunk_indices):
+        """Appends the incidence of the input chunk input_index to
+        indices_file and saves its labels.
+        """
+        with open(self.get_path("input_labels_{}.pkl".format(input_index)), "wb") as file:
+            pickle.dump(labels, file)
+        for node_ids in chunk_indices:
+            indices_file.write(node_ids.tobytes())
+
+    def compute_time_range_from_weights(self, nb_sample = None):
+        self.time_range = sorted(set(self.weights.tolist()))
+        if nb_sample != None and nb_sample > 0 and nb_sample < len(self.time_range):
+            self.time_range = [self.time_range[int(round(i))] for i in np.linspace(0, len(self.time_range)-1, nb_sample)]
+
+    def get_object_labels(self, dual=False):
+        """Returns the labels of the objects of the features, i.e.
+        self.edge_labels, or self.node_labels if dual.
+        """
+        return self.node_labels if dual else self.edge_labels
+
+    def get_chunk_incidence(self, chunk, start, stop):
+        """Returns the csr incidence of the edges start, ..., stop-1 of chunk.
+        """
+        indptr = chunk["indptr"][start : stop + 1]
+        return sp.csr_matrix((np.ones(indptr[-1] - indptr[0], dtype=np.int64),
+            chunk["indices"][indptr[0] : indptr[-1]], indptr - indptr[0]),
+            shape=(stop - start, len(self.node_labels)))
+
+
+    def get_max_pairs(self, state_nbytes):
+        """Returns the number of pairs of the batches and pages of a sweep
+        whose per-object state takes state_nbytes bytes: the pairs fit in the
+        memory that the state, the weights, two chunks and the per-object
+        bookkeeping of the batches (e.g. degrees) leave in self.memory_limit.
+        Raises a MemoryError if no memory is left for the pairs.
+        """
+        bookkeeping_nbytes = 8 * (len(self.node_labels) + self.nb_edges)
+        max_pairs = (self.memory_limit - state_nbytes - self.weights.nbytes
+            - 2 * self.max_chunk_nbytes - bookkeeping_nbytes) // PAIR_NBYTES
+        if max_pairs < 1:
+            raise MemoryError("The per-object state and the chunks need more than the memory limit of {} bytes"
+                .format(self.memory_limit))
+        return int(max_pairs)
+
+    def get_pair_stream(self, dual, max_pairs):
+        """Returns the stream of the pairs of objects (nodes if dual, else
+        edges), written by batches of at most max_pairs pairs on the first
+        call for this orientation.
+        """
+        if dual not in self.pair_streams:
+            self.pair_streams[dual] = self.write_node_pairs(max_pairs) if dual \
+                else self.write_edge_pairs(max_pairs)
+        return self.pair_streams[dual]
+
+    def write_pairs(self, name, steps, a, b, values):
+        """Saves the pairs of objects (a, b), sorted by steps, the edge ids at
+        which their overlaps become values, in the files name_<array>.npy of
+        the arrays of PAIR_ARRAYS. Returns the stream entry (name, first step,
+        last step + 1, number of pairs), or None if there are no pairs.
+        """
+        if len(steps) == 0:
+            return None
+        for array_name, array in zip(PAIR_ARRAYS, (steps, a, b, values)):
+            dtype = np.int32 if array.max() < 2**31 else np.int64
+            np.save(self.get_path("{}_{}.npy".format(name, array_name)), array.astype(dtype))
+        return (name, int(steps[0]), int(steps[-1]) + 1, len(steps))
+
+    def load_chunk_incidence(self, chunk_index):
+        chunk = self.load_chunk(chunk_index)
+        return self.get_chunk_incidence(chunk, 0, len(chunk["weights"]))
+
+    def write_edge_pairs(self, max_pairs):
+        """Writes the stream of the pairs of edges (a, b) sharing nodes, with
+        b < a, born with the edge a, whose values are their overlaps. The
+        rows of each chunk are multiplied by the incidence of the chunks
+        before it, by batches of rows whose numbers of products (bounded by
+        the degrees of their nodes in the edges born so far) are at most
+        max_pairs.
+        """
+        nb_nodes = len(self.node_labels)
+        degrees = np.zeros(nb_nodes, dtype=np.int64)
+        stream = []
+        for i in range(self.nb_chunks):
+            incidence = self.load_chunk_incidence(i)
+            degrees += np.bincount(incidence.indices, minlength=nb_nodes)
+            first_edge = i * self.chunk_size
+            for start, stop in get_batches(incidence @ degrees, max_pairs):
+                a, b, values = [], [], []
+                for j in range(i + 1):
+                    product = (incidence[start : stop] @
+                        (incidence if j == i else self.load_chunk_incidence(j)).T).tocoo()
+                    rows, columns = product.row + first_edge + start, product.col + j * self.chunk_size
+                    earlier = columns < rows
+                    a.append(rows[earlier])
+                    b.append(columns[earlier])
+                    values.append(product.data[earlier])
+                a, b, values = np.concatenate(a), np.concatenate(b), np.concatenate(values)
+                order = np.argsort(a, kind="stable")
+                stream.append(self.write_pairs("edge_pairs_{}".format(first_edge + start),
+                    a[order], a[order], b[order], values[order]))
+        return [entry for entry in stream if entry is not None]
+
+    def write_node_pairs(self, max_pairs):
+        """Writes the stream of the pairs of nodes (a, b) with a < b, once for
+        each edge containing both, whose values are their overlaps in the
+        edges up to this one. The pairs are generated by blocks of nodes a
+        whose numbers of pairs (bounded by the sizes of their edges) are at
+        most max_pairs, each block scanning all the chunks. The stream has a
+        file per block, sorted by edge id.
+        """
+        nb_nodes = len(self.node_labels)
+        bounds = np.zeros(nb_nodes, dtype=np.int64)
+        for i in range(self.nb_chunks):
+            incidence = self.load_chunk_incidence(i)
+            sizes = np.diff(incidence.indptr)
+            bounds += np.bincount(incidence.indices, weights=np.repeat(sizes - 1, sizes),
+                minlength=nb_nodes).astype(np.int64)
+        stream = []
+        for low, high in get_batches(bounds, max_pairs):
+            steps, a, b = [], [], []
+            for i in range(self.nb_chunks):
+                incidence = self.load_chunk_incidence(i)
+                rows = np.repeat(np.arange(incidence.shape[0]), np.diff(incidence.indptr))
+                # the partners of an entry are the next entries of its row (the indices are sorted)
+                entries = np.flatnonzero((incidence.indices >= low) & (incidence.indices < high))
+                lengths = incidence.indptr[rows[entries] + 1] - entries - 1
+                partners = get_ragged_ranges(entries + 1, lengths)
+                steps.append(np.repeat(rows[entries] + i * self.chunk_size, lengths))
+                a.append(np.repeat(incidence.indices[entries], lengths))
+                b.append(incidence.indices[partners])
+            steps, a, b = np.concatenate(steps), np.concatenate(a), np.concatenate(b)
+            # the value of a pair at an edge is the rank of the edge among the edges containing the pair
+            order = np.lexsort((steps, b, a))
+            steps, a, b = steps[order], a[order], b[order]
+            new_pair = np.ones(len(a), dtype=bool)
+            new_pair[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+            firsts = np.flatnonzero(new_pair)
+            values = np.arange(1, len(a) + 1) - np.repeat(firsts, np.diff(np.append(firsts, len(a))))
+            order = np.argsort(steps, kind="stable")
+            stream.append(self.write_pairs("node_pairs_{}".format(low),
+                steps[order], a[order], b[order], values[order]))
+        return [entry for entry in stream if entry is not None]
+
+    def read_pairs(self, dual, start, stop, max_pairs):
+        """Generates the pairs (a, b, values) of the stream of the objects
+        (nodes if dual, else edges) born with the edges start, ..., stop-1,
+        in pages of at most max_pairs pairs read from memory-mapped files.
+        """
+        for name, first_step, last_step, _ in self.get_pair_stream(dual, max_pairs):
+            if first_step >= stop or last_step <= start:
+                continue
+            arrays = self.load_pairs(name)
+            first, last = np.searchsorted(arrays[0], [start, stop])
+            for page in range(first, last, max_pairs):
+                page_stop = min(page + max_pairs, last)
+                yield tuple(np.asarray(array[page : page_stop], dtype=np.int64) for array in arrays[1:])
+
+    def load_pairs(self, name):
+        """Returns the memory-mapped arrays of PAIR_ARRAYS of the pair file
+        name, mapped once and cached in self.pair_arrays.
+        """
+        if name not in self.pair_arrays:
+            self.pair_arrays[name] = tuple(np.load(self.get_path("{}_{}.npy".format(name, array_name)),
+                mmap_mode="r") for array_name in PAIR_ARRAYS)
+        return self.pair_arrays[name]
+
+    def remove_pair_streams(self):
+        """Removes the files of the pair streams.
+        """
+        self.pair_arrays = {}
+        for stream in self.pair_streams.values():
+            for name, *_ in stream:
+                for array_name in PAIR_ARRAYS:
+                    os.remove(self.get_path("{}_{}.npy".format(name, array_name)))
+        self.pair_streams = {}
+
+    def get_feature_sets(self, aggregates, dual, max_pairs):
+        """Generates the feature arrays of the sub-hypergraphs (or of their
+        duals if dual) at the times of self.time_range, updating aggregates
+        with the edges and the pairs born at each time, paged in from the
+        chunks and the pair stream.
+        Features depending on the s-neighbors of the s-neighbors (see
+        OverlapAggregates.neighbor_max) read again all the pairs born so far
+        at each time.
+        """
+        chunk, chunk_index, nb_born = None, 0, 0
+        for t in self.time_range:
+            start, stop = nb_born, int(np.searchsorted(self.weights, t, side="right"))
+            while nb_born < stop:
+                if chunk is None or nb_born == chunk_index * self.chunk_size:
+                    chunk, chunk_index = self.load_chunk(chunk_index), chunk_index + 1
+                chunk_start = nb_born - (chunk_index - 1) * self.chunk_size
+                chunk_stop = min(stop - (chunk_index - 1) * self.chunk_size, len(chunk["weights"]))
+                indptr = chunk["indptr"][chunk_start : chunk_stop + 1]
+                aggregates.add_edges(nb_born, indptr - indptr[0], chunk["indices"][indptr[0] : indptr[-1]])
+                nb_born += chunk_stop - chunk_start
+            for a, b, values in self.read_pairs(dual, start, stop, max_pairs):
+                aggregates.add_pairs(a, b, values)
+            if aggregates.neighbor_max is not None:
+                aggregates.neighbor_max.fill(0)
+                for a, b, values in self.read_pairs(dual, 0, stop, max_pairs):
+                    aggregates.add_neighbor_pairs(a, b, values)
+            yield aggregates.get_feature_array()
+
+    def get_feature_persistence(self, feature, dual=False, display_progress=False):
+        """Returns the steady and ranging persistence of an overlap feature as
+        a FeaturePersistence (whose feature_sets are None), computed in one
+        sweep over the chunks and the pair stream (see `get_feature_sets`).
+        The throughput of the sweep and the memory of its arrays are stored in
+        self.statistics (and printed if display_progress).
+        The labels of the diagrams are decoded from the chunks once, for the
+        objects of the cornerpoints only.
+        """
+        if self.nb_edges == 0:
+            raise ValueError("No edges: call write_edges(...) first")
+        name, parameters = get_streamed_feature(feature)
+        start_time = time.time()
+        n = len(self.get_object_labels(dual))
+        aggregates = OverlapAggregates(name, parameters, n, len(self.node_labels), dual = dual)
+        state_nbytes = aggregates.get_nbytes() + OBJECT_NBYTES * n
+        max_pairs = self.get_max_pairs(state_nbytes)
+        nb_pairs = sum(entry[-1] for entry in self.get_pair_stream(dual, max_pairs))
+        feature_arrays = self.get_feature_sets(aggregates, dual, max_pairs)
+        if TQDM_FOUND and display_progress:
+            feature_arrays = iter(tqdm(feature_arrays, total = len(self.time_range)))
+        objects, births, deaths = sweep_steady_intervals(feature_arrays, self.time_range,
+            np.zeros(n, dtype=bool), np.full(n, np.nan))
+        steady_cornerpoints = tuple(CornerPoint(0, b, d, object = object)
+            for object, b, d in zip(objects.tolist(), births.tolist(), deaths.tolist()))
+        ranging_cornerpoints = tuple(get_ranging_cornerpoints(steady_cornerpoints))
+
+        seconds = time.time() - start_time
+        self.statistics.update({"edges" : self.nb_edges, "chunks" : self.nb_chunks,
+            "pairs" : nb_pairs, "time_steps" : len(self.time_range), "seconds" : seconds,
+            "edges_per_second" : self.nb_edges / seconds if seconds > 0 else INFINITY,
+            "time_steps_per_second" : len(self.time_range) / seconds if seconds > 0 else INFINITY,
+            "memory_bytes" : self.memory_limit - PAIR_NBYTES * (max_pairs - min(max_pairs, nb_pairs))})
+        if display_progress:
+            print("{edges} edges, {pairs} pairs, {time_steps} time steps in {seconds:.2f}s: "
+                "{edges_per_second:.0f} edges/s, {time_steps_per_second:.1f} time steps/s, "
+                "memory of the arrays up to {memory_bytes} bytes".format(**self.statistics))
+
+        labels = self.node_labels if dual else self.edge_labels.get_labels(objects.tolist())
+        return FeaturePersistence(feature, dual, tuple(self.time_range), None,
+            steady_cornerpoints,
+            PersistenceDiagram(cornerpoints = steady_cornerpoints,
+                xmax = self.time_range[-1], labels = labels),
+            ranging_cornerpoints,
+            PersistenceDiagram(cornerpoints = ranging_cornerpoints,
+                xmax = self.time_range[-1], labels = labels))
@@ -2,6 +2,7 @@
 import numpy as np
 from math import sqrt
 from collections import Counter
+from collections import namedtuple
 import colorsys
 
 import matplotlib.pyplot as plt
@@ -63,7 +64,7 @@ def plot_persistence_diagram(persistence=[], persistence_file='', ax=None, alpha
                             xmax=None,
                             band_boot=0., max_plots=0, cornerpoints = None,
                             coloring = False, labeling=False, legending=False,
-                            title = ""):
+                            title = "", labels = None):
     """This function plots the persistence diagram with an optional confidence band.
 
     :param persistence: The persistence to plot.
@@ -76,6 +77,8 @@ def plot_persistence_diagram(persistence=[], persistence_file='', ax=None, alpha
     :type band_boot: float.
     :param max_plots: number of maximal plots to be displayed
     :type max_plots: int.
+    :param labels: table used to decode the labels of cornerpoints without label from their object ids.
+    :type labels: list.
     :returns: plot -- A diagram plot of persistence.
     """
     if persistence_file != '':
@@ -131,6 +134,8 @@ def plot_persistence_diagram(persistence=[], persistence_file='', ax=None, alpha
 
         if not labeling or cp is None:
             label = None
+        elif cp.label is None and labels is not None:
+            label = str(labels[cp.object])
         else:
             label = cp.label
         (birth,death) = (interval[1][0], interval[1][1])
@@ -204,7 +209,6 @@ class CornerPoint:
         self.label = label
         self.object = object
         self.color = color
-        self.above_the_gap = False
 
     @property
     def is_cornerline(self):
@@ -230,9 +234,26 @@ class CornerPoint:
     def __repr__(self):
         return "Birth: {}\nDeath: {}\nVertices: {}".format(self.birth,
                                                            self.death,
-                                                           self.label)
+                                                           self.label if self.label is not None else self.object)
 
 
+class GapSelection(namedtuple("GapSelection", ["gap_number", "lower", "upper",
+        "cornerpoints_above_gap"])):
+    """Result of a gap query on a PersistenceDiagram (see
+    `PersistenceDiagram.get_gap_selection`).
+
+    Attributes
+    ----------
+
+    gap_number : int
+        rank of the gap, 0 being the widest gap.
+    lower, upper : CornerPoint
+        proper cornerpoints bounding the gap.
+    cornerpoints_above_gap : tuple
+        proper cornerpoints more persistent than the gap.
+    """
+    __slots__ = ()
+
 class PersistenceDiagram(object):
     """A persistence diagram is a multiset of 2-dimensional points called
     cornerpoints. The class allows to create a persistence diagram in two ways:
@@ -248,9 +269,13 @@ class PersistenceDiagram(object):
         A SimplexTree instance
     cornerpoints : list
         List of tuples of the form (k, (b, d))
+    labels : list
+        Table of the labels of the cornerpoints objects, when cornerpoints
+        objects are integer ids, or None
     """
-    def __init__(self, cornerpoints = None, xmin = None, xmax = None):
+    def __init__(self, cornerpoints = None, xmin = None, xmax = None, labels = None):
         self.cornerpoints = cornerpoints
+        self.labels = labels
         self.xmin = xmin
         self.xmax = xmax
         self.get_cornerpoints_multiset()
@@ -288,9 +313,17 @@ class PersistenceDiagram(object):
             cornerpoints = cornerpoints, ax = ax_handle,
             xmax = self.xmax,
             coloring = coloring, labeling=labeling, legending=legending,
-            title = title)
+            title = title, labels = self.labels)
         return ax_handle
 
+    def get_label(self, cornerpoint):
+        """Returns the label of cornerpoint, decoded from self.labels if
+        cornerpoint has no label.
+        """
+        if cornerpoint.label is None and self.labels is not None:
+            return str(self.labels[cornerpoint.object])
+        return cornerpoint.label
+
     def get_cornerpoint_objects(self):
         """Creates a list of CornerPoint instances
         """
@@ -311,9 +344,10 @@ class PersistenceDiagram(object):
         """Gets the list of proper cornerpoints (the ones with persistence
         smaller than infinity).
         """
-        self.proper_cornerpoints = [c for c in self.cornerpoints_multiset
-                                            if c.is_proper and not np.isnan(c.persistence)]
-        self.proper_cornerpoints.sort(key=lambda x: x.persistence)
+        proper_cornerpoints = [c for c in self.cornerpoints_multiset
+                               if c.is_proper and not np.isnan(c.persistence)]
+        proper_cornerpoints.sort(key=lambda x: x.persistence)
+        self.proper_cornerpoints = proper_cornerpoints
 
     def get_nth_widest_gap(self, n = 0):
         """Computes the widest gap according to the definition originally given
@@ -330,23 +364,169 @@ class PersistenceDiagram(object):
               2D clouds with provable guarantees." Pattern recognition letters
               83 (2016): 3-12.
         """
+        selection = self.get_gap_selection(n)
+        return selection.lower, selection.upper
+
+    def get_gap_selection(self, n = 0):
+        """Returns the GapSelection of the nth widest gap (see
+        `get_nth_widest_gap`). The diagram and its cornerpoints are not
+        modified, so gap queries can be made concurrently.
+        """
+        if not hasattr(self, "diagonal_gaps_order"):
+            self.get_diagonal_gaps_order()
+        dg_index = self.diagonal_gaps_order[n]
+        return GapSelection(n, self.proper_cornerpoints[dg_index], self.proper_cornerpoints[dg_index + 1],
+            tuple(self.proper_cornerpoints[dg_index + 1 :]))
+
+    def get_diagonal_gaps_order(self):
+        """Computes once the indices of the gaps between consecutive proper
+        cornerpoints sorted from the widest to the narrowest gap, used by
+        `get_nth_widest_gap`.
+        """
         if not hasattr(self, "proper_cornerpoints"):
             self.get_proper_cornerpoints()
-        self.gap_number = n
         diagonal_gaps = np.diff([p.persistence for p in self.proper_cornerpoints])
-        dg_index = np.argmax(diagonal_gaps)
-        dg_index = np.argsort(diagonal_gaps)[::-1][self.gap_number]
-        self.proper_cornerpoints_above_gap = self.proper_cornerpoints[dg_index + 1 :]
-        [setattr(c, 'above_the_gap', True) for c in self.proper_cornerpoints_above_gap]
-        return self.proper_cornerpoints[dg_index], self.proper_cornerpoints[dg_index + 1]
+        self.diagonal_gaps_order = np.argsort(diagonal_gaps)[::-1]
 
     def get_n_most_persistent_cornerpoints(self, n):
-        """Get the first n cornerpoints according to their poersistence
+        """Get the first n cornerpoints according to their persistence
         """
-        if not hasattr(self, "proper_cornerpoints"):
-            self.get_proper_cornerpoints()
-        self.proper_cornerpoints_reversed = self.proper_cornerpoints[::-1]
-        return self.proper_cornerpoints[: n + 1]
+        if not hasattr(self, "proper_cornerpoints_reversed"):
+            if not hasattr(self, "proper_cornerpoints"):
+                self.get_proper_cornerpoints()
+            self.proper_cornerpoints_reversed = self.proper_cornerpoints[::-1]
+        return self.proper_cornerpoints_reversed[:n]
+
+    ## INDEXED QUERIES
+    # The following indexes are built from the array form of the diagram the
+    # first time they are needed, and are then reused by all queries.
+    # Each index is computed in local variables and then assigned, the
+    # attribute tested by the queries last, so that concurrent queries never
+    # see a partial index (at worst an index is computed twice).
+
+    def get_cornerpoints_arrays(self):
+        """Computes the array form of the diagram: self.births, self.deaths and
+        self.persistences, aligned with self.cornerpoints.
+        """
+        births = np.asarray([c.birth for c in self.cornerpoints], dtype=float)
+        deaths = np.asarray([c.death for c in self.cornerpoints], dtype=float)
+        self.births = births
+        self.deaths = deaths
+        self.persistences = deaths - births
+
+    def get_object_index(self):
+        """Groups the cornerpoints by object: the indices of the cornerpoints of
+        the object of code self.object_codes[object] are
+        self.object_order[self.object_offsets[code] : self.object_offsets[code+1]].
+        """
+        object_codes = {}
+        codes = np.asarray([object_codes.setdefault(c.object, len(object_codes))
+                            for c in self.cornerpoints], dtype=np.int64)
+        self.object_order = np.argsort(codes, kind="stable")
+        self.object_offsets = np.concatenate(([0], np.cumsum(
+            np.bincount(codes, minlength=len(object_codes)))))
+        self.object_codes = object_codes
+
+    def get_persistence_index(self):
+        """Sorts the cornerpoints by increasing persistence (cornerlines last)
+        and by increasing birth.
+        """
+        if not hasattr(self, "persistences"):
+            self.get_cornerpoints_arrays()
+        persistence_order = np.argsort(self.persistences, kind="stable")
+        birth_order = np.argsort(self.births, kind="stable")
+        self.sorted_persistences = self.persistences[persistence_order]
+        self.persistence_order = persistence_order
+        self.sorted_births = self.births[birth_order]
+        self.birth_order = birth_order
+
+    def get_rank_index(self):
+        """Computes a wavelet matrix of the ranks of the deaths of the
+        cornerpoints sorted by birth, whose size is linear in the number of
+        cornerpoints times the number of bits of these ranks.
+        self.rank_births are the sorted births, self.rank_deaths the sorted
+        distinct deaths, and at the level l (from the highest bit),
+        self.rank_levels[l, i] is the number of the first i ranks of the level
+        whose bit is 0 and self.rank_zeros[l] the number of these ranks. The
+        ranks of the next level are the ones of this level whose bit is 0,
+        followed by the ones whose bit is 1.
+        """
+        if not hasattr(self, "persistences"):
+            self.get_cornerpoints_arrays()
+        birth_order = np.argsort(self.births, kind="stable")
+        rank_deaths, death_ranks = np.unique(self.deaths, return_inverse=True)
+        ranks = death_ranks.ravel()[birth_order]
+        nb_bits = int(len(rank_deaths)).bit_length() # the queried ranks go up to len(rank_deaths)
+        index_type = np.int32 if len(ranks) < 2**31 else np.int64
+        rank_levels = np.zeros((nb_bits, len(ranks) + 1), dtype=index_type)
+        rank_zeros = np.zeros(nb_bits, dtype=index_type)
+        for level, bit in enumerate(range(nb_bits - 1, -1, -1)):
+            zeros = ((ranks >> bit) & 1) == 0
+            np.cumsum(zeros, out=rank_levels[level, 1:])
+            rank_zeros[level] = rank_levels[level, -1]
+            ranks = np.concatenate((ranks[zeros], ranks[~zeros]))
+        self.rank_births = self.births[birth_order]
+        self.rank_deaths = rank_deaths
+        self.rank_zeros = rank_zeros
+        self.rank_levels = rank_levels
+
+    def get_object_cornerpoints(self, object):
+        """Returns the list of the cornerpoints of object
+        """
+        if not hasattr(self, "object_codes"):
+            self.get_object_index()
+        if object not in self.object_codes:
+            return []
+        code = self.object_codes[object]
+        return [self.cornerpoints[i] for i in
+                self.object_order[self.object_offsets[code] : self.object_offsets[code + 1]]]
+
+    def get_cornerpoints_in_persistence_band(self, min_persistence, max_persistence = np.inf):
+        """Returns the list of the cornerpoints whose persistence is in
+        [min_persistence, max_persistence], sorted by increasing persistence.
+        """
+        if not hasattr(self, "persistence_order"):
+            self.get_persistence_index()
+        start = np.searchsorted(self.sorted_persistences, min_persistence, side="left")
+        stop = np.searchsorted(self.sorted_persistences, max_persistence, side="right")
+        return [self.cornerpoints[i] for i in self.persistence_order[start:stop]]
+
+    def get_cornerpoints_in_region(self, min_birth, max_birth, min_death = -np.inf, max_death = np.inf):
+        """Returns the list of the cornerpoints in the region
+        [min_birth, max_birth] x [min_death, max_death], sorted by birth.
+        """
+        if not hasattr(self, "birth_order"):
+            self.get_persistence_index()
+        start = np.searchsorted(self.sorted_births, min_birth, side="left")
+        stop = np.searchsorted(self.sorted_births, max_birth, side="right")
+        indices = self.birth_order[start:stop]
+        deaths = self.deaths[indices]
+        return [self.cornerpoints[i] for i in indices[(deaths >= min_death) & (deaths <= max_death)]]
+
+    def get_rank_function(self, u, v):
+        """Evaluates the persistent rank function, i.e. the number of
+        cornerpoints with birth <= u and death > v, at every pair (u, v) of
+        the arrays u and v (O(log n) per pair): among the first
+        cornerpoints sorted by birth, the ones whose death rank is below the
+        one of v are counted level by level in the wavelet matrix (see
+        `get_rank_index`).
+        """
+        if not hasattr(self, "rank_levels"):
+            self.get_rank_index()
+        u, v = np.broadcast_arrays(np.asarray(u, dtype=float), np.asarray(v, dtype=float))
+        nb_born = np.searchsorted(self.rank_births, u, side="right")
+        death_ranks = np.searchsorted(self.rank_deaths, v, side="right")
+        start, stop = np.zeros_like(nb_born), nb_born
+        nb_below = np.zeros_like(nb_born)
+        nb_bits = len(self.rank_zeros)
+        for level, bit in enumerate(range(nb_bits - 1, -1, -1)):
+            zeros = self.rank_levels[level]
+            start_zeros, stop_zeros = zeros[start], zeros[stop]
+            ones = ((death_ranks >> bit) & 1) == 1
+            nb_below += np.where(ones, stop_zeros - start_zeros, 0)
+            start = np.where(ones, self.rank_zeros[level] + start - start_zeros, start_zeros)
+            stop = np.where(ones, self.rank_zeros[level] + stop - stop_zeros, stop_zeros)
+        return (nb_born - nb_below)[()]
 
     def plot_nth_widest_gap(self, ax_handle = None, n = 0):
         """Plots the widest gap on the persistence diagram already plotted in
@@ -354,8 +534,6 @@ class PersistenceDiagram(object):
         """
         if ax_handle is None:
             fig, ax_handle = plt.subplots()
-        if hasattr(self, 'gap_number'):
-            n = self.gap_number
         l, u = self.get_nth_widest_gap(n = n)
         x = np.asarray(ax_handle.get_xlim())
         y_l =  x + l.persistence
@@ -366,10 +544,10 @@ class PersistenceDiagram(object):
         ordinal = lambda n: "%d%s" % (n,"tsnrhtdd"[(n/10%10!=1)*(n%10<4)*n%10::4])
         ax_handle.set_title("Visualizing the {} widest gap".format(ordinal(n)))
 
-    def mark_points_above_diagonal_gaps(self, ax_handle):
-        """Marks the points above the widest gap by circling them in red
+    def mark_points_above_diagonal_gaps(self, ax_handle, n = 0):
+        """Marks the points above the nth widest gap by circling them in red
         """
-        for c in self.proper_cornerpoints_above_gap:
+        for c in self.get_gap_selection(n).cornerpoints_above_gap:
             ax_handle.plot(c.birth, c.death, 'o', ms=14, markerfacecolor="None",
              markeredgecolor='red', markeredgewidth=5)
 
@@ -378,4 +556,4 @@ def generate_n_distinct_colors(n):
     """Generates n distinct colors
     """
     hsv_tuples = [(i * 1.0 / n, 0.5, 0.5) for i in range(n)]
-    return map(lambda x: colorsys.hsv_to_rgb(*x), hsv_tuples)
+    return [colorsys.hsv_to_rgb(*x) for x in hsv_tuples]
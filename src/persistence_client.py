@@ -0,0 +1,197 @@
+# Client of the local persistence service (see `src/persistence_service.py`)
+# This module only depends on the standard library and numpy, so that callers
+# do not pay for importing HyperNetX: the diagrams are computed and kept warm
+# by the service and are sent back in a compact binary encoding.
+#
+# Protocol: every message is framed by its length (unsigned 32 bits, little
+# endian). A request is a json object; a response is a status byte (0 if ok,
+# 1 if error) followed by the encoded diagrams, or by the error message.
+import json
+import os
+import socket
+import struct
+import numpy as np
+from collections import namedtuple
+
+MAGIC = b"HGPD"
+VERSION = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+class EncodedDiagram(namedtuple("EncodedDiagram", ["labels", "births", "deaths"])):
+    """Cornerpoints of a persistence diagram decoded from the service.
+
+    Attributes
+    ----------
+
+    labels : list
+        labels of the objects of the cornerpoints.
+    births, deaths : numpy arrays
+        births and deaths of the cornerpoints (infinite deaths for the
+        cornerlines).
+    """
+    __slots__ = ()
+
+class RemotePersistence(namedtuple("RemotePersistence", ["time_range", "steady", "ranging"])):
+    """Steady and ranging persistence of a feature returned by the service.
+
+    Attributes
+    ----------
+
+    time_range : numpy array
+        times of the filtration.
+    steady, ranging : EncodedDiagram
+        steady and ranging diagrams.
+    """
+    __slots__ = ()
+
+def encode_persistence(time_range, diagrams):
+    """Returns the binary encoding of time_range and of diagrams, a list of
+    triples (labels, births, deaths).
+    The labels of all the diagrams are stored once, as a table of utf-8
+    strings, and every cornerpoint is an int32 index in this table followed by
+    its birth and death as float64.
+    """
+    label_ids = {}
+    objects = [np.asarray([label_ids.setdefault(str(label), len(label_ids)) for label in labels],
+        dtype="<i4") for labels, _, _ in diagrams]
+    table = "\0".join(label_ids).encode("utf-8")
+    time_range = np.asarray(time_range, dtype="<f8")
+    chunks = [MAGIC, struct.pack("<BIII", VERSION, len(time_range), len(label_ids), len(table)),
+        time_range.tobytes(), table, struct.pack("<I", len(diagrams))]
+    for diagram_objects, (_, births, deaths) in zip(objects, diagrams):
+        chunks += [struct.pack("<I", len(diagram_objects)), diagram_objects.tobytes(),
+            np.asarray(births, dtype="<f8").tobytes(), np.asarray(deaths, dtype="<f8").tobytes()]
+    return b"".join(chunks)
+
+def decode_persistence(data):
+    """Decodes data encoded by `encode_persistence` as a pair
+    (time_range, list of EncodedDiagram).
+    """
+    if data[:4] != MAGIC:
+        raise ValueError("Not an encoded persistence")
+    version, nb_times, nb_labels, table_size = struct.unpack_from("<BIII", data, 4)
+    if version != VERSION:
+        raise ValueError("Unsupported encoding version {}".format(version))
+    offset = 4 + struct.calcsize("<BIII")
+    time_range = np.frombuffer(data, dtype="<f8", count=nb_times, offset=offset)
+    offset += 8 * nb_times
+    table = data[offset : offset + table_size].decode("utf-8")
+    labels = table.split("\0") if nb_labels > 0 else []
+    offset += table_size
+    nb_diagrams, = struct.unpack_from("<I", data, offset)
+    offset += 4
+    diagrams = []
+    for _ in range(nb_diagrams):
+        n, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        objects = np.frombuffer(data, dtype="<i4", count=n, offset=offset)
+        births = np.frombuffer(data, dtype="<f8", count=n, offset=offset + 4 * n)
+        deaths = np.frombuffer(data, dtype="<f8", count=n, offset=offset + 12 * n)
+        offset += 20 * n
+        diagrams.append(EncodedDiagram([labels[i] for i in objects.tolist()], births, deaths))
+    return time_range, diagrams
+
+def to_persistence_diagram(diagram, time_range):
+    """Returns the PersistenceDiagram of an EncodedDiagram of a filtration
+    over time_range (the labels of the cornerpoints being their objects).
+    This imports `src/persistence.py`.
+    """
+    from src.persistence import CornerPoint, PersistenceDiagram
+    cornerpoints = [CornerPoint(0, b, d, label = label)
+        for label, b, d in zip(diagram.labels, diagram.births.tolist(), diagram.deaths.tolist())]
+    return PersistenceDiagram(cornerpoints = cornerpoints, xmax = time_range[-1])
+
+def send_message(sock, data):
+    sock.sendall(struct.pack("<I", len(data)) + data)
+
+def receive_exactly(sock, n):
+    buffer = bytearray()
+    while len(buffer) < n:
+        chunk = sock.recv(n - len(buffer))
+        if not chunk:
+            raise ConnectionError("Connection closed by the persistence service")
+        buffer += chunk
+    return bytes(buffer)
+
+def receive_message(sock):
+    n, = struct.unpack("<I", receive_exactly(sock, 4))
+    return receive_exactly(sock, n)
+
+class PersistenceClient:
+    """Blocking client of a persistence service listening on the Unix socket
+    path, or on host:port if path is None. The connection is opened at the
+    first request and kept open.
+
+    Attributes
+    ----------
+
+    path : string or None
+        path of the Unix socket of the service.
+    host, port : string, int
+        address of the service if path is None.
+    timeout : float or None
+        timeout of the socket operations, in seconds.
+    """
+    def __init__(self, path = None, host = "127.0.0.1", port = None, timeout = None):
+        if path is None and port is None:
+            raise ValueError("A socket path or a port is needed")
+        self.path = path
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+
+    def connect(self):
+        if self.path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(self.path)
+        else:
+            self.sock = socket.create_connection((self.host, self.port), timeout = self.timeout)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def request(self, request):
+        """Sends request (a json-serializable dictionary) and returns the
+        payload of the response. Raises a RuntimeError with the message of the
+        service if the request failed.
+        """
+        if self.sock is None:
+            self.connect()
+        try:
+            send_message(self.sock, json.dumps(request).encode("utf-8"))
+            response = receive_message(self.sock)
+        except (OSError, ConnectionError):
+            self.close()
+            raise
+        if response[0] != STATUS_OK:
+            raise RuntimeError(response[1:].decode("utf-8"))
+        return response[1:]
+
+    def get_feature_persistence(self, filename, feature, dual = False, parameters = None,
+            nodes_key = "onstage", nb_sample = None):
+        """Returns the RemotePersistence of the feature named feature (a
+        function of `src/edge_features.py`, called with the keyword arguments
+        parameters) on the filtration of the hyperbard file filename (see
+        `src/persistence_service.py`). A relative filename is relative to the
+        working directory of the caller, not of the service.
+        """
+        data = self.request({"filename" : os.path.abspath(filename), "feature" : feature, "dual" : dual,
+            "parameters" : parameters or {}, "nodes_key" : nodes_key, "nb_sample" : nb_sample})
+        time_range, (steady, ranging) = decode_persistence(data)
+        return RemotePersistence(time_range, steady, ranging)
+
+    def get_statistics(self):
+        """Returns the cache statistics of the service as a dictionary.
+        """
+        return json.loads(self.request({"statistics" : True}).decode("utf-8"))
@@ -0,0 +1,268 @@
+# Local persistence service
+# A long-running asyncio server that computes the steady and ranging
+# persistence diagrams of features of hyperbard filtrations and keeps them warm:
+# - the filtrations are loaded once per worker process and kept in a LRU cache,
+#   and all the requests on a filtration are sent to the same worker process;
+# - the encoded diagrams are kept in a LRU cache of the server;
+# - identical concurrent requests are coalesced into one computation;
+# - the computations run in worker processes, off the event loop; a worker
+#   process that dies is replaced and its computation retried once.
+# The protocol and the binary encoding of the diagrams are defined in
+# `src/persistence_client.py`, which is the client to use.
+#
+# To start the service, go to the repository and call for instance:
+#     python3 -m src.persistence_service --socket /tmp/hypergraph_persistence.sock
+import argparse
+import asyncio
+import json
+import os
+import signal
+import struct
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from src.persistence_client import encode_persistence
+from src.persistence_client import STATUS_OK
+from src.persistence_client import STATUS_ERROR
+
+################################################################################
+## WORKER PROCESSES
+
+FILTRATIONS = OrderedDict() # warm filtrations of the worker process, in LRU order
+MAX_FILTRATIONS = 8
+
+def set_max_filtrations(max_filtrations):
+    """Initializer of the worker processes.
+    """
+    global MAX_FILTRATIONS
+    MAX_FILTRATIONS = max_filtrations
+
+def get_filtration(filename, mtime, nodes_key, nb_sample):
+    """Returns the HyperGraphFiltration of the hyperbard file filename (see
+    `src/hyperbard.py`), loaded from the cache of the worker process
+    if it is warm. mtime is the modification time of the file, so a modified
+    file is loaded again.
+    """
+    key = (filename, mtime, nodes_key, nb_sample)
+    if key in FILTRATIONS:
+        FILTRATIONS.move_to_end(key)
+        return FILTRATIONS[key]
+    from src.hyperbard import build_edgedict_from_hyperbard_file
+    from src.hyperbard import build_hypergraphfiltration_from_edgedict
+    from src.hyperbard import HYPERBARD_STRINGS_TO_ERASE
+    with open(filename, "r") as file:
+        edgedict = build_edgedict_from_hyperbard_file(file, HYPERBARD_STRINGS_TO_ERASE)
+    H = build_hypergraphfiltration_from_edgedict(edgedict, nodes_key = nodes_key)
+    H.compute_time_range_from_weights(nb_sample)
+    FILTRATIONS[key] = H
+    while len(FILTRATIONS) > MAX_FILTRATIONS:
+        FILTRATIONS.popitem(last = False)
+    return H
+
+def compute_encoded_persistence(filename, mtime, nodes_key, nb_sample, feature_name, dual, parameters):
+    """Returns the encoded steady and ranging persistence diagrams of the
+    feature feature_name of `src/edge_features.py`, called with the keyword
+    arguments of parameters (a tuple of pairs). The overlap features
+    (`overlap_*`) are computed on the sparse overlaps of the filtration.
+    """
+    import src.edge_features as feat
+    from src.hypergraph_filtration import get_feature_array
+    feature = getattr(feat, feature_name, None)
+    if not feature_name.endswith("_feature") or not callable(feature):
+        raise ValueError("Unknown feature {}".format(feature_name))
+    feature = partial(feature, **dict(parameters))
+    H = get_filtration(filename, mtime, nodes_key, nb_sample)
+    if feature_name.startswith("overlap_"):
+        feature_sets = [get_feature_array(feature(H.get_sub_overlap(t, dual = dual))) for t in H.time_range]
+        persistence = H.get_feature_persistence_from_sets(feature, dual, feature_sets)
+    else:
+        persistence = H.get_feature_persistence(feature, dual = dual)
+    return encode_persistence(persistence.time_range, [
+        ([pd.get_label(c) for c in pd.cornerpoints], [c.birth for c in pd.cornerpoints],
+            [c.death for c in pd.cornerpoints])
+        for pd in (persistence.steady_pd, persistence.ranging_pd)])
+
+################################################################################
+## SERVER
+
+class PersistenceService:
+    """Asyncio persistence service (see the head of this file).
+
+    Attributes
+    ----------
+
+    diagrams : collections.OrderedDict
+        LRU cache of the encoded diagrams, of the form request key : bytes.
+    pending : dictionary
+        computations in progress, of the form request key : asyncio.Task.
+        Identical requests received during a computation wait for its task.
+    max_diagrams : int
+        maximal number of encoded diagrams kept in self.diagrams.
+    executors : list of concurrent.futures.ProcessPoolExecutor
+        pools of a single worker process, each one keeping at most
+        max_filtrations warm filtrations. The requests on a filtration are
+        always computed by the same worker (see `get_executor`), so the
+        filtration is loaded once; the requests on one filtration are thus
+        computed one after the other. A pool whose worker died is replaced
+        (see `compute`).
+    max_filtrations : int
+        maximal number of filtrations kept by each worker process.
+    statistics : dictionary
+        counts of the requests, cache hits, coalesced requests, computations,
+        restarts of worker processes and errors.
+    """
+    def __init__(self, max_diagrams = 256, max_filtrations = 8, max_workers = None):
+        self.diagrams = OrderedDict()
+        self.pending = {}
+        self.max_diagrams = max_diagrams
+        self.max_filtrations = max_filtrations
+        self.executors = [self.create_executor() for _ in range(max_workers or os.cpu_count() or 1)]
+        self.statistics = {"requests" : 0, "hits" : 0, "coalesced" : 0, "computations" : 0,
+            "restarts" : 0, "errors" : 0}
+
+    def create_executor(self):
+        return ProcessPoolExecutor(1, initializer = set_max_filtrations, initargs = (self.max_filtrations,))
+
+    def get_request_key(self, request):
+        """Returns the key of a request, i.e. the arguments of
+        `compute_encoded_persistence`. Raises a ValueError if the request is
+        not valid.
+        """
+        if "filename" not in request or "feature" not in request:
+            raise ValueError("A request needs a filename and a feature")
+        filename = os.path.abspath(request["filename"])
+        if not os.path.exists(filename):
+            raise ValueError("The file {} doesn't exist".format(request["filename"]))
+        parameters = request.get("parameters") or {}
+        return (filename, os.path.getmtime(filename), request.get("nodes_key", "onstage"),
+            request.get("nb_sample"), request["feature"], bool(request.get("dual", False)),
+            tuple(sorted(parameters.items())))
+
+    def get_executor_index(self, key):
+        """Returns the index in self.executors of the executor of the worker
+        process of the filtration of the request key.
+        """
+        return hash(key[:4]) % len(self.executors)
+
+    def get_statistics(self):
+        return dict(self.statistics, cached_diagrams = len(self.diagrams),
+            cached_bytes = sum(len(data) for data in self.diagrams.values()), pending = len(self.pending))
+
+    async def compute(self, key):
+        """Computes the encoded diagrams of key in the process pool and stores
+        them in the LRU cache.
+        If the worker process dies (e.g. killed or out of memory), its pool
+        is broken for good: it is replaced by a new one and the computation
+        is retried once, a second failure being reported to the client.
+        """
+        try:
+            self.statistics["computations"] += 1
+            index = self.get_executor_index(key)
+            for retry in (False, True):
+                executor = self.executors[index]
+                try:
+                    data = await asyncio.get_running_loop().run_in_executor(executor,
+                        compute_encoded_persistence, *key)
+                    break
+                except BrokenProcessPool:
+                    if self.executors[index] is executor: # not yet replaced by another computation
+                        executor.shutdown(wait = False, cancel_futures = True)
+                        self.executors[index] = self.create_executor()
+                        self.statistics["restarts"] += 1
+                    if retry:
+                        raise
+            self.diagrams[key] = data
+            while len(self.diagrams) > self.max_diagrams:
+                self.diagrams.popitem(last = False)
+            return data
+        finally:
+            del self.pending[key]
+
+    async def get_encoded_persistence(self, request):
+        """Returns the encoded diagrams of request, from the cache, from a
+        computation in progress for an identical request or from a new
+        computation.
+        """
+        self.statistics["requests"] += 1
+        key = self.get_request_key(request)
+        if key in self.diagrams:
+            self.statistics["hits"] += 1
+            self.diagrams.move_to_end(key)
+            return self.diagrams[key]
+        if key in self.pending:
+            self.statistics["coalesced"] += 1
+        else:
+            self.pending[key] = asyncio.ensure_future(self.compute(key))
+        # shield: a disconnected client does not cancel the computation for the others
+        return await asyncio.shield(self.pending[key])
+
+    async def handle_connection(self, reader, writer):
+        """Answers the requests of a connection, one after the other, until
+        the client closes it.
+        """
+        try:
+            while True:
+                try:
+                    n, = struct.unpack("<I", await reader.readexactly(4))
+                    message = await reader.readexactly(n)
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    request = json.loads(message.decode("utf-8"))
+                    if request.get("statistics"):
+                        payload = json.dumps(self.get_statistics()).encode("utf-8")
+                    else:
+                        payload = await self.get_encoded_persistence(request)
+                    response = bytes([STATUS_OK]) + payload
+                except Exception as e:
+                    self.statistics["errors"] += 1
+                    response = bytes([STATUS_ERROR]) + "{}: {}".format(type(e).__name__, e).encode("utf-8")
+                writer.write(struct.pack("<I", len(response)) + response)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path = None, host = "127.0.0.1", port = None):
+        """Serves forever on the Unix socket path, or on host:port if path is
+        None.
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path = path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        for executor in self.executors:
+            executor.shutdown(cancel_futures = True)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Local service of persistence diagrams of hyperbard filtrations.")
+    parser.add_argument("--socket", help = "path of the Unix socket to listen on")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, help = "port to listen on if no socket is given")
+    parser.add_argument("--max-diagrams", type = int, default = 256)
+    parser.add_argument("--max-filtrations", type = int, default = 8, help = "per worker process")
+    parser.add_argument("--workers", type = int, default = None)
+    args = parser.parse_args()
+    if args.socket is None and args.port is None:
+        parser.error("a socket path or a port is needed")
+
+    service = PersistenceService(args.max_diagrams, args.max_filtrations, args.workers)
+    signal.signal(signal.SIGTERM, signal.default_int_handler) # stop as on ctrl-c
+    try:
+        asyncio.run(service.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Sharded steady and ranging persistence
+# The time range of a filtration is split into shards of consecutive time
+# steps that can be computed independently (see
+# `HyperGraphFiltration.get_steady_shard`), possibly as separate local jobs,
+# and whose partial results are then merged into the exact global diagrams.
+import numpy as np
+from collections import namedtuple
+from numpy import inf as INFINITY
+
+class SteadyShard(namedtuple("SteadyShard", ["start", "time_range", "objects",
+        "births", "deaths"])):
+    """Partial steady persistence of a feature on the time steps
+    start, ..., start + len(time_range) - 1 of a filtration.
+
+    Attributes
+    ----------
+
+    start : int
+        index of the first time step of the shard in the time range of the
+        filtration.
+    time_range : numpy array
+        times of the shard.
+    objects, births, deaths : numpy arrays
+        steady intervals of the shard. The intervals open at the left
+        boundary have birth time_range[0] (the object may have been born in a
+        previous shard), and the ones open at the right boundary have an
+        infinite death (the object may die in a next shard).
+    """
+    __slots__ = ()
+
+def save_steady_shard(shard, filename):
+    """Saves shard in the numpy file filename (.npz).
+    """
+    np.savez(filename, start = shard.start, time_range = shard.time_range,
+        objects = shard.objects, births = shard.births, deaths = shard.deaths)
+
+def load_steady_shard(filename):
+    """Loads a shard saved by `save_steady_shard`.
+    """
+    with np.load(filename) as data:
+        return SteadyShard(int(data["start"]), data["time_range"], data["objects"],
+            data["births"], data["deaths"])
+
+def get_objects_number(shards):
+    """Returns 1 + the maximum object id of the shards.
+    """
+    return max([int(shard.objects.max()) + 1 for shard in shards if len(shard.objects) > 0],
+        default = 0)
+
+def merge_steady_shards(shards):
+    """Stitches the shards of a time range into the global steady intervals,
+    returned as three arrays (objects, births, deaths).
+    The intervals open at the right boundary of a shard are continued by the
+    intervals open at the left boundary of the next shard, or closed at the
+    first time of the next shard if the object is not alive there.
+    """
+    shards = sorted(shards, key = lambda shard: shard.start)
+    open_births = np.full(get_objects_number(shards), np.nan) # births of the intervals open at the last boundary
+    objects, births, deaths = [], [], []
+    for shard in shards:
+        first_time = shard.time_range[0]
+        shard_births = shard.births.copy()
+        left_open = shard_births == first_time
+        alive_at_first_time = np.zeros(len(open_births), dtype=bool)
+        alive_at_first_time[shard.objects[left_open]] = True
+
+        dead = np.flatnonzero(~np.isnan(open_births) & ~alive_at_first_time)
+        objects.append(dead)
+        births.append(open_births[dead])
+        deaths.append(np.full(len(dead), first_time, dtype=float))
+
+        continued = left_open & ~np.isnan(open_births[shard.objects])
+        shard_births[continued] = open_births[shard.objects[continued]]
+        right_open = shard.deaths == INFINITY
+        objects.append(shard.objects[~right_open])
+        births.append(shard_births[~right_open])
+        deaths.append(shard.deaths[~right_open])
+        open_births[:] = np.nan
+        open_births[shard.objects[right_open]] = shard_births[right_open]
+
+    dead = np.flatnonzero(~np.isnan(open_births))
+    objects.append(dead)
+    births.append(open_births[dead])
+    deaths.append(np.full(len(dead), INFINITY))
+    return (np.concatenate(objects).astype(np.int64), np.concatenate(births),
+        np.concatenate(deaths))
+
+def merge_ranging_shards(shards):
+    """Computes the global ranging intervals directly from the shards,
+    returned as three arrays (objects, births, deaths) sorted by object.
+    The birth of an object is its minimal birth in the shards. Its death is
+    its maximal death among the intervals closed in a shard, the first time
+    of the next shard for the intervals open at the right boundary of a
+    shard and absent from the next one, or infinity if it is alive at the
+    last time step.
+    """
+    shards = sorted(shards, key = lambda shard: shard.start)
+    n = get_objects_number(shards)
+    ranging_births = np.full(n, INFINITY)
+    ranging_deaths = np.full(n, -INFINITY)
+    for i, shard in enumerate(shards):
+        np.minimum.at(ranging_births, shard.objects, shard.births)
+        right_open = shard.deaths == INFINITY
+        np.maximum.at(ranging_deaths, shard.objects[~right_open], shard.deaths[~right_open])
+        if i + 1 == len(shards):
+            ranging_deaths[shard.objects[right_open]] = INFINITY
+        else:
+            next_shard = shards[i + 1]
+            alive_at_next_time = np.zeros(n, dtype=bool)
+            alive_at_next_time[next_shard.objects[next_shard.births == next_shard.time_range[0]]] = True
+            dead = shard.objects[right_open & ~alive_at_next_time[shard.objects]]
+            np.maximum.at(ranging_deaths, dead, next_shard.time_range[0])
+    objects = np.flatnonzero(ranging_births < INFINITY)
+    return objects, ranging_births[objects], ranging_deaths[objects]
@@ -0,0 +1,147 @@
+import src.edge_features as feat
+from src.hyperbard import build_edgedict_from_hyperbard_file
+from src.hyperbard import build_hypergraphfiltration_from_edgedict
+from src.hyperbard import HYPERBARD_STRINGS_TO_ERASE
+from src.sharded_persistence import save_steady_shard
+from src.sharded_persistence import load_steady_shard
+from src.out_of_core_filtration import OutOfCoreHyperGraphFiltration
+
+import glob
+import sys
+import os.path
+import tempfile
+
+################################################################################
+
+FEATURES = [feat.strict_hyperhub_feature, feat.local_max_size_feature, feat.exclusivity_feature,
+    feat.max_originality_feature, feat.mean_originality_feature]
+NB_SHARDS = [3, 7]
+TOP_K = [1, 5] # small values of k, so that the pruning of the top-k sweep is used
+# (chunk_size, memory_limit) of the out-of-core filtrations: small chunks and pages of a few hundred pairs, or a
+# single chunk and page
+OUT_OF_CORE_SETTINGS = [(3, 2**15), (1000, 2**30)]
+
+def usage():
+    print("USAGE:")
+    print("python3 test_equivalence.py [filename ...]")
+    print("-------------------------------------------")
+    print("filename is a `*.edges.csv` file from the Hyperbard dataset (by \
+default, the files of the `data` directory).")
+    print("This script checks that the fast paths of the persistence \
+computation give the same diagrams as the plain computation, for the scene- \
+and character-hypergraph filtrations of each file and for the features of \
+`src/edge_features.py`:\n\
+    - the steady and ranging diagrams merged from time shards, computed in \
+this process (through shard files) or in local processes (for the first \
+feature), are the diagrams of the unsharded filtration;\n\
+    - the k most persistent cornerpoints of the top-k sweep are the ones of \
+the full diagrams (`get_n_most_persistent_cornerpoints(k)`), ties included \
+and in the same order, and its cornerlines are the ones of the full diagrams;\n\
+    - the out-of-core filtration (`src/out_of_core_filtration.py`) gives the \
+diagrams of the overlap counterparts of the features, up to the ids and the \
+order of the cornerpoints.\n\
+The script prints the mismatches and exits with status 1 if there are any.")
+
+def get_triples(cornerpoints):
+    return [(cp.object, cp.birth, cp.death) for cp in cornerpoints]
+
+def check(mismatches, name, expected, computed):
+    if expected != computed:
+        mismatches.append(name)
+        print("MISMATCH: " + name)
+
+def check_sharded_persistence(HGF, filename, feature, dual, full, mismatches, in_processes = False):
+    for nb_shards in NB_SHARDS:
+        # shards saved and loaded as on other machines, merged in any order
+        with tempfile.TemporaryDirectory() as directory:
+            shard_files = []
+            for i, (start, stop) in enumerate(HGF.get_time_shards(nb_shards)):
+                shard_files.append(os.path.join(directory, "shard_{}.npz".format(i)))
+                save_steady_shard(HGF.get_steady_shard(feature, start, stop, dual = dual), shard_files[-1])
+            shards = [load_steady_shard(shard_file) for shard_file in reversed(shard_files)]
+        merged = HGF.get_persistence_from_shards(feature, dual, shards)
+        name = "{} {} dual={} {} shards".format(filename, feature.__name__, dual, nb_shards)
+        check(mismatches, name + " (steady)", get_triples(full.steady_cornerpoints),
+            get_triples(merged.steady_cornerpoints))
+        check(mismatches, name + " (ranging)", get_triples(full.ranging_cornerpoints),
+            get_triples(merged.ranging_cornerpoints))
+    if not in_processes:
+        return
+    merged = HGF.get_sharded_feature_persistence(feature, NB_SHARDS[-1], dual = dual)
+    name = "{} {} dual={} {} shards in processes".format(filename, feature.__name__, dual, NB_SHARDS[-1])
+    check(mismatches, name, (get_triples(full.steady_cornerpoints), get_triples(full.ranging_cornerpoints)),
+        (get_triples(merged.steady_cornerpoints), get_triples(merged.ranging_cornerpoints)))
+
+def check_top_k_persistence(HGF, filename, feature, dual, full, mismatches):
+    for k in TOP_K:
+        top_k = HGF.get_top_k_feature_persistence(feature, k, dual = dual)
+        name = "{} {} dual={} top {}".format(filename, feature.__name__, dual, k)
+        check(mismatches, name + " (steady)", get_triples(full.steady_pd.get_n_most_persistent_cornerpoints(k)),
+            get_triples(top_k.steady_cornerpoints))
+        check(mismatches, name + " (ranging)", get_triples(full.ranging_pd.get_n_most_persistent_cornerpoints(k)),
+            get_triples(top_k.ranging_cornerpoints))
+        check(mismatches, name + " (cornerlines)",
+            (get_triples(cp for cp in full.steady_cornerpoints if cp.is_cornerline),
+                get_triples(cp for cp in full.ranging_cornerpoints if cp.is_cornerline)),
+            (get_triples(top_k.steady_cornerlines), get_triples(top_k.ranging_cornerlines)))
+
+def get_labelled_triples(pd):
+    return sorted(((cp.birth, cp.death, str(pd.get_label(cp))) for cp in pd.cornerpoints))
+
+def check_out_of_core_persistence(out_of_core_filtrations, filename, feature, dual, full, mismatches):
+    overlap_feature = getattr(feat, "overlap_" + feature.__name__)
+    for (chunk_size, memory_limit), OCF in zip(OUT_OF_CORE_SETTINGS, out_of_core_filtrations):
+        out_of_core = OCF.get_feature_persistence(overlap_feature, dual = dual)
+        name = "{} {} dual={} out of core (chunks of {} edges, {} bytes)".format(filename,
+            overlap_feature.__name__, dual, chunk_size, memory_limit)
+        check(mismatches, name + " (steady)", get_labelled_triples(full.steady_pd),
+            get_labelled_triples(out_of_core.steady_pd))
+        check(mismatches, name + " (ranging)", get_labelled_triples(full.ranging_pd),
+            get_labelled_triples(out_of_core.ranging_pd))
+
+def test_equivalence():
+    filenames = sys.argv[1:] or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        "data", "*.edges.csv")))
+    if len(filenames) == 0:
+        usage()
+        return None
+    mismatches = []
+    for filename in filenames:
+        if not os.path.exists(filename):
+            print("Error, the file "+filename+" doesn't exists")
+            return None
+        file = open(filename, "r")
+        edgedict = build_edgedict_from_hyperbard_file(file, HYPERBARD_STRINGS_TO_ERASE)
+        file.close()
+        HGF = build_hypergraphfiltration_from_edgedict(edgedict,
+            nodes_key = "onstage",
+            name_key = None,
+            weight_key = None)
+        HGF.compute_time_range_from_weights()
+        filename = os.path.basename(filename)
+        # same edges, names and weights as build_hypergraphfiltration_from_edgedict
+        edges = [(edge_number, set(dict["onstage"]), edge_number) for edge_number, dict in enumerate(edgedict)]
+        out_of_core_filtrations = [OutOfCoreHyperGraphFiltration(chunk_size = chunk_size, memory_limit = memory_limit)
+            for chunk_size, memory_limit in OUT_OF_CORE_SETTINGS]
+        for OCF in out_of_core_filtrations:
+            OCF.write_edges(edges)
+
+        for dual in [False, True]:
+            for feature in FEATURES:
+                full = HGF.get_feature_persistence(feature, dual = dual)
+                check_sharded_persistence(HGF, filename, feature, dual, full, mismatches,
+                    in_processes = feature is FEATURES[0])
+                check_top_k_persistence(HGF, filename, feature, dual, full, mismatches)
+                check_out_of_core_persistence(out_of_core_filtrations, filename, feature, dual, full, mismatches)
+        for OCF in out_of_core_filtrations:
+            OCF.close()
+        print("{}: checked".format(filename))
+
+    print("{} mismatches".format(len(mismatches)))
+    if len(mismatches) > 0:
+        sys.exit(1)
+
+################################################################################
+
+if __name__ == "__main__":
+    test_equivalence()